@@ -0,0 +1,198 @@
+import json
+import hashlib
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request, jsonify, abort, stream_with_context
+from sqlalchemy.orm import joinedload
+
+from availability import find_available
+from extensions import db, query_stats, parallel
+from forms import AvailabilityForm
+from models import Venue, Artist, Show, ShowArchive
+from queries import detail_queries
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def collection_etag(*aggregates):
+  # fingerprint a collection with one aggregate query instead of serializing it
+  fingerprint = json.dumps(list(db.session.query(*aggregates).one()), default=str)
+  return hashlib.md5((request.path + fingerprint).encode()).hexdigest()
+
+def stream_ndjson(query, serialize, etag):
+  if request.if_none_match.contains(etag):
+    response = Response(status=304)
+  else:
+    # stream_results keeps a server-side cursor open so memory stays flat
+    rows = query.execution_options(stream_results=True).yield_per(current_app.config['API_YIELD_PER'])
+    def generate():
+      for row in rows:
+        yield json.dumps(serialize(row)) + '\n'
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+  response.set_etag(etag)
+  return response
+
+def json_detail(data):
+  response = jsonify(data)
+  response.add_etag()
+  return response.make_conditional(request)
+
+def entity_aggregates(model):
+  return (
+    db.func.count(model.id),
+    db.func.max(model.id),
+    db.func.sum(model.version),
+    db.func.sum(model.upcoming_shows_count),
+    db.func.sum(model.past_shows_count)
+  )
+
+@bp.route('/venues')
+@db.read_only
+@query_stats.budget(2)
+def api_venues():
+  query = db.session.query(
+    Venue.id, Venue.name, Venue.city, Venue.state,
+    Venue.upcoming_shows_count, Venue.past_shows_count
+  ).order_by(Venue.id)
+  return stream_ndjson(query, lambda row: {
+    'id': row.id,
+    'name': row.name,
+    'city': row.city,
+    'state': row.state,
+    'upcoming_shows_count': row.upcoming_shows_count,
+    'past_shows_count': row.past_shows_count
+  }, collection_etag(*entity_aggregates(Venue)))
+
+@bp.route('/artists')
+@db.read_only
+@query_stats.budget(2)
+def api_artists():
+  query = db.session.query(
+    Artist.id, Artist.name, Artist.city, Artist.state,
+    Artist.upcoming_shows_count, Artist.past_shows_count
+  ).order_by(Artist.id)
+  return stream_ndjson(query, lambda row: {
+    'id': row.id,
+    'name': row.name,
+    'city': row.city,
+    'state': row.state,
+    'upcoming_shows_count': row.upcoming_shows_count,
+    'past_shows_count': row.past_shows_count
+  }, collection_etag(*entity_aggregates(Artist)))
+
+@bp.route('/shows')
+@db.read_only
+@query_stats.budget(2)
+def api_shows():
+  query = db.session.query(
+    Show.id, Show.start_time, Show.end_time, Show.venue_id, Venue.name.label('venue_name'),
+    Show.artist_id, Artist.name.label('artist_name')
+  ).join(Venue, Venue.id == Show.venue_id
+  ).join(Artist, Artist.id == Show.artist_id
+  ).order_by(Show.start_time, Show.id)
+  # rows carry venue and artist names, so their versions are part of the tag
+  etag = collection_etag(
+    db.func.count(Show.id),
+    db.func.max(Show.id),
+    db.session.query(db.func.sum(Venue.version)).as_scalar(),
+    db.session.query(db.func.sum(Artist.version)).as_scalar()
+  )
+  return stream_ndjson(query, lambda row: {
+    'id': row.id,
+    'start_time': row.start_time.isoformat(),
+    'end_time': row.end_time.isoformat(),
+    'venue_id': row.venue_id,
+    'venue_name': row.venue_name,
+    'artist_id': row.artist_id,
+    'artist_name': row.artist_name
+  }, etag)
+
+@bp.route('/venues/<int:venue_id>')
+@db.read_only
+@query_stats.budget(4)
+def api_venue(venue_id):
+  rows, genres, upcoming_shows, past_shows = parallel.gather(*detail_queries(Venue, venue_id, datetime.now()))
+  if not rows:
+    abort(404)
+  venue = rows[0]
+  return json_detail({
+    'id': venue.id,
+    'name': venue.name,
+    'genres': [name for name, in genres],
+    'address': venue.address,
+    'city': venue.city,
+    'state': venue.state,
+    'phone': venue.phone,
+    'website': venue.website,
+    'facebook_link': venue.facebook_link,
+    'seeking_talent': venue.seeking_talent,
+    'seeking_description': venue.seeking_description,
+    'image_link': venue.image_link,
+    'shows': [{
+      'id': show.id,
+      'artist_id': show.other_id,
+      'artist_name': show.other_name,
+      'start_time': show.start_time.isoformat(),
+      'end_time': show.end_time.isoformat()
+    } for show in past_shows + upcoming_shows]
+  })
+
+@bp.route('/artists/<int:artist_id>')
+@db.read_only
+@query_stats.budget(4)
+def api_artist(artist_id):
+  rows, genres, upcoming_shows, past_shows = parallel.gather(*detail_queries(Artist, artist_id, datetime.now()))
+  if not rows:
+    abort(404)
+  artist = rows[0]
+  return json_detail({
+    'id': artist.id,
+    'name': artist.name,
+    'genres': [name for name, in genres],
+    'city': artist.city,
+    'state': artist.state,
+    'phone': artist.phone,
+    'website': artist.website,
+    'facebook_link': artist.facebook_link,
+    'seeking_venue': artist.seeking_venue,
+    'seeking_description': artist.seeking_description,
+    'image_link': artist.image_link,
+    'shows': [{
+      'id': show.id,
+      'venue_id': show.other_id,
+      'venue_name': show.other_name,
+      'start_time': show.start_time.isoformat(),
+      'end_time': show.end_time.isoformat()
+    } for show in past_shows + upcoming_shows]
+  })
+
+@bp.route('/shows/<int:show_id>')
+@db.read_only
+@query_stats.budget(2)
+def api_show(show_id):
+  show = Show.query.options(joinedload(Show.venue), joinedload(Show.artist)).get(show_id)
+  if show is None:
+    # archived shows keep their ids
+    show = ShowArchive.query.options(joinedload(ShowArchive.venue), joinedload(ShowArchive.artist)).filter(
+      ShowArchive.id == show_id).first()
+  if show is None:
+    abort(404)
+  return json_detail({
+    'id': show.id,
+    'start_time': show.start_time.isoformat(),
+    'end_time': show.end_time.isoformat(),
+    'venue_id': show.venue_id,
+    'venue_name': show.venue.name,
+    'artist_id': show.artist_id,
+    'artist_name': show.artist.name,
+    'artist_image_link': show.artist.image_link
+  })
+
+@bp.route('/availability')
+@db.read_only
+@query_stats.budget(2)
+def api_availability():
+  # e.g. ?state=CA&city=San Francisco&genres=Jazz&start=2030-01-01&end=2030-01-07
+  form = AvailabilityForm(request.args)
+  if not form.validate():
+    return jsonify({'errors': form.errors}), 400
+  return jsonify(find_available(form, request.args))
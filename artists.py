@@ -0,0 +1,252 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import flag_modified
+
+import autocomplete
+import directory
+from extensions import db, cache, query_stats, parallel
+from formatting import format_datetimes
+from forms import ArtistForm
+from models import Artist, Show, ShowArchive
+from queries import (decode_cursor, encode_cursor, keyset_page, keyset_query, split_page,
+  count_query, refresh_show_counts, genres_by_name, genre_filter, text_search, detail_queries,
+  detail_fingerprint)
+
+bp = Blueprint('artists', __name__)
+
+@bp.route('/artists')
+@db.read_only
+@query_stats.budget(1)
+@cache.cached
+def artists():
+  genres = request.args.getlist('genre')
+  after = request.args.get('after')
+  if after:
+    after = decode_cursor(after, str, int)
+  query = db.session.query(Artist.id, Artist.name, Artist.version).filter(genre_filter(Artist, genres))
+  artists, has_more = keyset_page(query, [Artist.name, Artist.id], after)
+  data = [{
+    'id': artist_id,
+    'name': name,
+    'version': version
+  } for artist_id, name, version in artists]
+  cache.tag('artists', *['artist:{}'.format(artist['id']) for artist in data])
+  next_cursor = encode_cursor(data[-1]['name'], data[-1]['id']) if has_more else None
+  return render_template('pages/artists.html', artists=data, next_cursor=next_cursor, genres=genres)
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+@db.read_only
+@query_stats.budget(2)
+def search_artists():
+  search_term=request.values.get('search_term', '')
+  genres = request.values.getlist('genre')
+  after = request.values.get('after')
+  if after:
+    after = decode_cursor(after, float, str, int)
+  query, rank = text_search(db.session.query(Artist), Artist, search_term)
+  query = query.filter(genre_filter(Artist, genres))
+  # best matches first; name and id break ties and keep the cursor unique
+  page = query.with_entities(
+    Artist.id,
+    Artist.name,
+    Artist.upcoming_shows_count,
+    -rank
+  )
+  # the count and the page don't depend on each other
+  counted, rows = parallel.gather(count_query(query), keyset_query(page, [-rank, Artist.name, Artist.id], after))
+  count = counted[0][0]
+  artists, has_more = split_page(rows)
+  data = [{
+    'id': artist_id,
+    'name': name,
+    'num_upcoming_shows': num_upcoming_shows
+  } for artist_id, name, num_upcoming_shows, _ in artists]
+
+  response={
+    "count": count,
+    "data": data,
+    "next_cursor": encode_cursor(artists[-1][3], artists[-1][1], artists[-1][0]) if has_more else None
+  }
+  return render_template('pages/search_artists.html', results=response, search_term=search_term, genres=genres)
+
+@bp.route('/artists/<int:artist_id>')
+@db.read_only
+@query_stats.budget(5)
+@cache.conditional(lambda artist_id: detail_fingerprint(Artist, artist_id, datetime.now()))
+@cache.cached
+def show_artist(artist_id):
+  now = datetime.now()
+  # the row, its genres and its upcoming and past shows, all at once
+  rows, genres, upcoming_shows, past_shows = parallel.gather(*detail_queries(Artist, artist_id, now))
+  if not rows:
+    abort(404)
+  artist = rows[0]
+  past_times = format_datetimes([show.start_time for show in past_shows], 'full')
+  upcoming_times = format_datetimes([show.start_time for show in upcoming_shows], 'full')
+  cache.tag('artist:{}'.format(artist.id), *['venue:{}'.format(show.other_id) for show in upcoming_shows + past_shows])
+  data = {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": [name for name, in genres],
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": [{
+      "venue_id": show.other_id,
+      "venue_name": show.other_name,
+      "venue_image_link": show.other_image_link,
+      "start_time": start_time
+    } for show, start_time in zip(past_shows, past_times) ],
+    "upcoming_shows": [{
+      "venue_id": show.other_id,
+      "venue_name": show.other_name,
+      "venue_image_link": show.other_image_link,
+      "start_time": start_time
+    } for show, start_time in zip(upcoming_shows, upcoming_times) ],
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
+  return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  artist = Artist.query.get(artist_id)
+  form = ArtistForm(obj=artist)
+  form.genres.data = [genre.name for genre in artist.genres]
+  data ={
+    "id": artist.id,
+    "name": artist.name,
+    "genres": [genre.name for genre in artist.genres],
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_talent": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link
+  }
+  return render_template('forms/edit_artist.html', form=form, artist=data)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  form = ArtistForm(request.form, meta={"csrf": False})
+  if form.validate_on_submit():
+    current_app.logger.debug('artist form validated')
+    try:
+      artist = Artist.query.get(artist_id)
+      old_city, old_state = artist.city, artist.state
+      seeking_venue = False
+      seeking_description = ''
+      if 'seeking_venue' in request.form:
+        seeking_venue = form.seeking_venue.data
+        if 'seeking_description' in request.form:
+          seeking_description = form.seeking_description.data
+      artist.name = form.name.data
+      artist.city = form.city.data
+      artist.state = form.state.data
+      artist.phone = form.phone.data
+      artist.image_link = form.image_link.data
+      artist.website = form.website.data
+      artist.genres = genres_by_name(form.genres.data)
+      artist.facebook_link = form.facebook_link.data
+      artist.seeking_venue = seeking_venue
+      artist.seeking_description = seeking_description
+      # a genres-only edit doesn't UPDATE the row, so force the version bump
+      flag_modified(artist, 'name')
+      db.session.add(artist)
+      db.session.commit()
+      # a new name or genre can move the artist onto /artists pages that
+      # weren't tagged with it
+      cache.invalidate('artist:{}'.format(artist_id), 'artists')
+      autocomplete.entity_saved('artists', artist, (old_city, old_state))
+      flash('Artist ' + artist.name + ' was successfully changed.')
+    except SQLAlchemyError:
+      db.session.rollback()
+      current_app.logger.exception('could not save artist %s', artist_id)
+      flash('An error occurred. Changes could not be saved.')
+  else:
+    current_app.logger.info('artist form rejected', extra={'form_errors': form.errors})
+    flash('An error occurred. Please check the fields and try again', category='error')
+    return render_template('forms/edit_artist.html', form=form, artist=Artist.query.get_or_404(artist_id))
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+@bp.route('/artist/<artist_id>', methods=['POST'])
+def delete_artist(artist_id):
+  try:
+    # the cascade removes this artist's shows, so their venues need recounting
+    venue_ids = [venue_id for venue_id, in db.session.query(Show.venue_id).filter(
+      Show.artist_id == artist_id).union(db.session.query(ShowArchive.venue_id).filter(
+      ShowArchive.artist_id == artist_id))]
+    areas = db.session.query(Artist.city, Artist.state).filter(Artist.id == artist_id).all()
+    artist = Artist.query.filter_by(id=artist_id).delete()
+    refresh_show_counts(datetime.now(), venue_ids=venue_ids)
+    directory.refresh(venue_ids=venue_ids)
+    db.session.commit()
+    cache.invalidate('artist:{}'.format(artist_id), *['venue:{}'.format(i) for i in venue_ids])
+    for city, state in areas:
+      autocomplete.entity_deleted('artists', artist_id, city, state)
+  except SQLAlchemyError:
+    current_app.logger.exception('could not delete artist %s', artist_id)
+    db.session.rollback()
+    flash('An error occurred. Artist could not be deleted.')
+    return redirect(url_for('.artists'))
+  flash('The artist and shows have been excluded.')
+  return redirect(url_for('index'))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  form = ArtistForm(request.form, meta={"csrf": False})
+  if form.validate_on_submit():
+    current_app.logger.debug('artist form validated')
+    try:
+      seeking_venue = False
+      seeking_description = ''
+      if 'seeking_venue' in request.form:
+        seeking_venue = form.seeking_venue.data
+        if 'seeking_description' in request.form:
+          seeking_description = form.seeking_description.data
+      artist = Artist(name=form.name.data)
+      artist.city = form.city.data
+      artist.state = form.state.data
+      artist.address = form.address.data
+      artist.phone = form.phone.data
+      artist.image_link = form.image_link.data
+      artist.website = form.website.data
+      artist.genres = genres_by_name(request.form.getlist('genres'))
+      artist.facebook_link = form.facebook_link.data
+      artist.seeking_venue = seeking_venue
+      artist.seeking_description = seeking_description
+      db.session.add(artist)
+      db .session.commit()
+      cache.invalidate('artists')
+      autocomplete.entity_saved('artists', artist)
+      flash('Artist ' + artist.name + ' was successfully listed!')
+    except SQLAlchemyError:
+      db.session.rollback()
+      current_app.logger.exception('could not create artist')
+      flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+  else:
+    current_app.logger.info('artist form rejected', extra={'form_errors': form.errors})
+    flash('An error occurred. Please check the fields and try again', category='error')
+    return render_template('forms/new_artist.html', form=ArtistForm(request.form, meta={"csrf": False}))
+
+  return render_template('pages/home.html')
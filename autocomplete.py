@@ -0,0 +1,188 @@
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from flask import Blueprint, current_app, request, jsonify
+
+from extensions import db
+from models import Venue, Artist
+
+bp = Blueprint('autocomplete', __name__)
+
+KINDS = ('venues', 'artists', 'cities')
+
+
+def normalize(text):
+    # case, accents and punctuation don't matter when typing
+    text = unicodedata.normalize('NFKD', text or '').casefold()
+    return ' '.join(re.findall(r'[^\W_]+', ''.join(c for c in text if not unicodedata.combining(c))))
+
+
+class PrefixIndex(object):
+    """Sorted arrays of (key, ident), one per kind, searched with bisect.
+
+    Every entry is keyed by its normalized text from the start of each of
+    its first `max_words` words, so 'The Musical Hop' is found by 'mus' as
+    well as 'the m'. Keys are cut to `max_key` characters, which bounds the
+    memory per entry; longer prefixes are checked against the full text.
+    Entries with the same kind and ident are reference counted, so a city
+    stays listed while any venue or artist is in it.
+    """
+
+    def __init__(self, max_words=4, max_key=32):
+        self.max_words = max_words
+        self.max_key = max_key
+        self.keys = dict((kind, []) for kind in KINDS)
+        # (kind, ident) -> [label, normalized text, references]
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def load(self, items):
+        """Replaces the contents with (kind, ident, text, label) items,
+        sorting each array once instead of inserting one by one."""
+        keys = dict((kind, []) for kind in KINDS)
+        entries = {}
+        for kind, ident, text, label in items:
+            entry = entries.get((kind, ident))
+            if entry is not None:
+                entry[2] += 1
+                continue
+            text = normalize(text)
+            entries[(kind, ident)] = [label, text, 1]
+            keys[kind].extend((key, ident) for key in self.keys_for(text))
+        for found in keys.values():
+            found.sort()
+        with self.lock:
+            self.keys, self.entries = keys, entries
+
+    def keys_for(self, text):
+        starts = [0] + [match.end() for match in re.finditer(' ', text)]
+        return set(text[start:start + self.max_key] for start in starts[:self.max_words])
+
+    def add(self, kind, ident, text, label):
+        with self.lock:
+            entry = self.entries.get((kind, ident))
+            if entry is not None:
+                entry[2] += 1
+                return
+            text = normalize(text)
+            self.entries[(kind, ident)] = [label, text, 1]
+            found = self.keys[kind]
+            for key in self.keys_for(text):
+                found.insert(bisect_left(found, (key, ident)), (key, ident))
+
+    def remove(self, kind, ident):
+        with self.lock:
+            entry = self.entries.get((kind, ident))
+            if entry is None:
+                return
+            entry[2] -= 1
+            if entry[2] > 0:
+                return
+            del self.entries[(kind, ident)]
+            found = self.keys[kind]
+            for key in self.keys_for(entry[1]):
+                position = bisect_left(found, (key, ident))
+                if position < len(found) and found[position] == (key, ident):
+                    del found[position]
+
+    def lookup(self, kind, prefix, limit=10):
+        """Labels of up to `limit` entries with a word starting with prefix,
+        in key order: O(log n + limit) for prefixes up to max_key."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        key = prefix[:self.max_key]
+        results, seen = [], set()
+        with self.lock:
+            found = self.keys[kind]
+            position = bisect_left(found, (key,))
+            while position < len(found) and len(results) < limit:
+                entry_key, ident = found[position]
+                position += 1
+                if not entry_key.startswith(key):
+                    break
+                if ident in seen:
+                    continue
+                label, text, _ = self.entries[(kind, ident)]
+                if len(prefix) > self.max_key and (' ' + prefix) not in (' ' + text):
+                    continue
+                seen.add(ident)
+                results.append(label)
+        return results
+
+    def __len__(self):
+        return sum(len(found) for found in self.keys.values())
+
+
+#----------------------------------------------------------------------------#
+# Keeping the index current.
+#----------------------------------------------------------------------------#
+
+# Each worker process holds its own index. The create, edit and delete
+# handlers update it after they commit; changes made by other workers, bulk
+# imports or the command line show up once AUTOCOMPLETE_REBUILD_SECONDS
+# have passed and the next lookup rebuilds it.
+
+@bp.record_once
+def setup(state):
+    state.app.config.setdefault('AUTOCOMPLETE_LIMIT', 10)
+    state.app.config.setdefault('AUTOCOMPLETE_REBUILD_SECONDS', 300)
+    state.app.extensions['autocomplete'] = {'index': PrefixIndex(), 'built': None}
+
+@bp.before_app_first_request
+def build():
+    rows = []
+    for model, kind in ((Venue, 'venues'), (Artist, 'artists')):
+        for ident, name, city, state in db.session.query(model.id, model.name, model.city, model.state):
+            rows.append((kind, ident, name, {'id': ident, 'name': name}))
+            rows.append(('cities', (city, state), city, {'city': city, 'state': state}))
+    state = current_app.extensions['autocomplete']
+    state['index'].load(rows)
+    state['built'] = time.time()
+
+def get_index():
+    state = current_app.extensions['autocomplete']
+    rebuild = current_app.config['AUTOCOMPLETE_REBUILD_SECONDS']
+    if state['built'] is None or (rebuild is not None and state['built'] + rebuild < time.time()):
+        build()
+    return state['index']
+
+def entity_saved(kind, entity, old_area=None):
+    """Call after committing a created or edited venue or artist; old_area
+    is its (city, state) before an edit."""
+    index = current_app.extensions['autocomplete']['index']
+    if old_area is not None:
+        entity_deleted(kind, entity.id, *old_area)
+    index.add(kind, entity.id, entity.name, {'id': entity.id, 'name': entity.name})
+    index.add('cities', (entity.city, entity.state), entity.city, {'city': entity.city, 'state': entity.state})
+
+def entity_deleted(kind, ident, city, state):
+    index = current_app.extensions['autocomplete']['index']
+    index.remove(kind, int(ident))
+    index.remove('cities', (city, state))
+
+def invalidate():
+    # after changes too many to apply one by one, e.g. a bulk import
+    current_app.extensions['autocomplete']['built'] = None
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+@bp.route('/autocomplete')
+def autocomplete():
+    """Suggestions for a search box: /autocomplete?q=mus&type=venues
+
+    type may repeat and defaults to venues, artists and cities.
+    """
+    prefix = request.args.get('q', '')
+    kinds = [kind for kind in request.args.getlist('type') if kind in KINDS] or list(KINDS)
+    limit = min(request.args.get('limit', current_app.config['AUTOCOMPLETE_LIMIT'], type=int), 50)
+    index = get_index()
+    response = jsonify(dict((kind, index.lookup(kind, prefix, limit)) for kind in kinds))
+    # typing back over a prefix needn't ask again
+    response.cache_control.max_age = 60
+    return response
@@ -0,0 +1,53 @@
+from datetime import datetime, time, timedelta
+
+from flask import Blueprint, render_template, request
+
+from extensions import db, query_stats, parallel
+from forms import AvailabilityForm
+from models import Venue, Artist
+from queries import decode_cursor, encode_cursor, keyset_query, split_page
+from scheduling import available
+
+bp = Blueprint('availability', __name__)
+
+def window(form):
+  # the form's days as a half-open datetime range
+  start_time = datetime.combine(form.start.data, time.min)
+  return start_time, datetime.combine(form.end.data + timedelta(days=1), time.min)
+
+def find_available(form, args):
+  """Open venues and free artists for a validated AvailabilityForm, one
+  keyset page of each; args carries the venues_after/artists_after cursors."""
+  start_time, end_time = window(form)
+  kinds = ((Venue, 'venues'), (Artist, 'artists'))
+  pages = []
+  for model, kind in kinds:
+    after = args.get(kind + '_after')
+    if after:
+      after = decode_cursor(after, str, int)
+    query = available(model, form.state.data, form.city.data, form.genres.data, start_time, end_time)
+    pages.append(keyset_query(query, [model.name, model.id], after))
+  # the two searches are independent, so they run at the same time
+  results = {}
+  for (model, kind), rows in zip(kinds, parallel.gather(*pages)):
+    rows, has_more = split_page(rows)
+    results[kind] = {
+      'data': [{
+        'id': row.id,
+        'name': row.name,
+        'city': row.city,
+        'state': row.state
+      } for row in rows],
+      'next_cursor': encode_cursor(rows[-1].name, rows[-1].id) if has_more else None
+    }
+  return results
+
+@bp.route('/availability')
+@db.read_only
+@query_stats.budget(2)
+def availability():
+  form = AvailabilityForm(request.args)
+  results = None
+  if request.args and form.validate():
+    results = find_available(form, request.args)
+  return render_template('pages/availability.html', form=form, results=results)
@@ -0,0 +1,109 @@
+"""Times the availability search against loading shows per venue and artist.
+
+Seeds a scratch database with benchmarks/seed.py unless it already holds
+shows, then runs the same random area/genre/window searches two ways: the
+set-based `scheduling.available` query the /availability page uses, and
+the naive approach of listing the seeking venues and artists of the area
+and fetching each one's shows in the window. Prints the query plan and the
+latency of both.
+
+    python benchmarks/availability.py --venues 5000 --artists 20000 --shows 500000
+    python benchmarks/availability.py --database-url postgresql://localhost/fyyur-bench
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask_migrate import upgrade
+from sqlalchemy import text
+
+from app import create_app, init_migrate
+from extensions import db
+from models import Venue, Artist, Show
+from queries import genre_filter
+from scheduling import available
+from seed import GENRES, MIGRATIONS, seed
+
+
+def set_based(model, state, city, genres, start_time, end_time):
+  return available(model, state, city, genres, start_time, end_time).all()
+
+
+def per_entity(model, state, city, genres, start_time, end_time):
+  seeking = model.seeking_talent if model is Venue else model.seeking_venue
+  column = Show.venue_id if model is Venue else Show.artist_id
+  candidates = db.session.query(model.id, model.name, model.city, model.state).filter(
+    seeking, model.state == state, db.func.lower(model.city) == city.lower(),
+    genre_filter(model, genres)).all()
+  free = []
+  for candidate in candidates:
+    shows = Show.query.filter(column == candidate.id).all()
+    if not any(show.start_time < end_time and show.end_time > start_time for show in shows):
+      free.append(candidate)
+  return free
+
+
+def searches(count, rng):
+  # areas weighted by how many venues they hold, like real traffic
+  areas = db.session.query(Venue.city, Venue.state).all()
+  today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+  for _ in range(count):
+    city, state = rng.choice(areas)
+    start_time = today + timedelta(days=rng.randint(0, 300))
+    yield state, city, rng.sample(GENRES, rng.randint(0, 1)), start_time, start_time + timedelta(days=rng.randint(1, 14))
+
+
+def explain(query):
+  sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+  prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+  return [str(row[-1]) for row in db.session.execute(text(prefix + sql))]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url',
+    default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur-availability.sqlite'))
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=6000)
+  parser.add_argument('--shows', type=int, default=200000)
+  parser.add_argument('--searches', type=int, default=100)
+  parser.add_argument('--seed', type=int, default=42)
+  args = parser.parse_args()
+
+  app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url})
+  init_migrate(app)
+  with app.app_context():
+    upgrade(directory=MIGRATIONS)
+    if not db.session.execute(text('SELECT count(*) FROM "Show"')).scalar():
+      print(seed(args.venues, args.artists, args.shows, seed=args.seed))
+
+    plan = list(searches(1, random.Random(args.seed)))[0]
+    for line in explain(available(Venue, *plan)):
+      print('  plan  {}'.format(line))
+    plans = list(searches(args.searches, random.Random(args.seed)))
+    for model in (Venue, Artist):
+      found = {}
+      for approach in (set_based, per_entity):
+        timings, found[approach] = [], []
+        for search in plans:
+          started = time.perf_counter()
+          found[approach].append(len(approach(model, *search)))
+          timings.append(time.perf_counter() - started)
+          db.session.expunge_all()
+        timings.sort()
+        print('{:<8} {:<12} p50 {:8.3f} ms  p95 {:8.3f} ms  {} results'.format(
+          model.__tablename__, approach.__name__, timings[len(timings) // 2] * 1000,
+          timings[int(len(timings) * 0.95)] * 1000, sum(found[approach])))
+      if found[set_based] != found[per_entity]:
+        print('  results differ between the two approaches')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,145 @@
+"""Measures read-route throughput at a fixed concurrency, with and without
+parallel queries.
+
+Seeds a scratch database with benchmarks/seed.py unless it already holds
+shows, then serves the app from a threaded WSGI server once per
+--parallel-workers setting (0 is the plain one-query-after-another path)
+and keeps --concurrency clients requesting detail, search and
+availability pages for --seconds. Prints requests per second and latency
+for each setting. The response cache is off.
+
+SQLite answers in microseconds, from the same process, so there is
+little waiting on the database to overlap; --latency-ms adds a sleep to
+every statement to stand in for the round trip to a networked Postgres.
+
+    python benchmarks/concurrency.py --latency-ms 2
+    python benchmarks/concurrency.py --database-url postgresql://localhost/fyyur-bench --concurrency 32
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import quote_plus
+from urllib.request import urlopen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask_migrate import upgrade
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from werkzeug.serving import make_server
+
+from app import create_app, init_migrate
+from extensions import db
+from models import Venue, Artist
+import seed as seeder
+
+
+def urls(rng, venue_ids, artist_ids, areas):
+  """An endless mix of the routes that gather their queries."""
+  terms = ['City 1', 'Velvet', 'Room', 'Tigers', 'Golden Hall', 'Neon']
+  today = date.today()
+  while True:
+    city, state = rng.choice(areas)
+    start = today + timedelta(days=rng.randint(0, 300))
+    yield rng.choice([
+      '/venues/{}'.format(rng.choice(venue_ids)),
+      '/artists/{}'.format(rng.choice(artist_ids)),
+      '/api/v1/venues/{}'.format(rng.choice(venue_ids)),
+      '/api/v1/artists/{}'.format(rng.choice(artist_ids)),
+      '/venues/search?search_term={}'.format(quote_plus(rng.choice(terms))),
+      '/artists/search?search_term={}'.format(quote_plus(rng.choice(terms))),
+      '/availability?state={}&city={}&start={}&end={}'.format(
+        state, quote_plus(city), start, start + timedelta(days=7)),
+    ])
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def drive(port, concurrency, seconds, targets):
+  latencies, errors = [], []
+  deadline = time.perf_counter() + seconds
+
+  def client(number):
+    rng = random.Random(number)
+    for url in targets(rng):
+      if time.perf_counter() >= deadline:
+        return
+      started = time.perf_counter()
+      try:
+        with urlopen('http://127.0.0.1:{}{}'.format(port, url)) as response:
+          response.read()
+        latencies.append(time.perf_counter() - started)
+      except Exception as e:
+        errors.append('{}: {}'.format(url, e))
+
+  clients = [threading.Thread(target=client, args=(number,)) for number in range(concurrency)]
+  started = time.perf_counter()
+  for thread in clients:
+    thread.start()
+  for thread in clients:
+    thread.join()
+  return latencies, errors, time.perf_counter() - started
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url',
+    default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur-concurrency.sqlite'))
+  parser.add_argument('--venues', type=int, default=1000)
+  parser.add_argument('--artists', type=int, default=3000)
+  parser.add_argument('--shows', type=int, default=100000)
+  parser.add_argument('--concurrency', type=int, default=16, help='Clients requesting at the same time.')
+  parser.add_argument('--seconds', type=float, default=10)
+  parser.add_argument('--parallel-workers', default='0,8', help='PARALLEL_QUERY_WORKERS settings to compare.')
+  parser.add_argument('--latency-ms', type=float, default=0, help='Simulated database round trip per statement.')
+  args = parser.parse_args()
+
+  if args.latency_ms:
+    event.listen(Engine, 'before_cursor_execute', lambda *_: time.sleep(args.latency_ms / 1000.0))
+  for workers in [int(value) for value in args.parallel_workers.split(',')]:
+    app = create_app({
+      'SQLALCHEMY_DATABASE_URI': args.database_url,
+      'CACHE_TYPE': 'null',
+      'PARALLEL_QUERY_WORKERS': workers,
+      # room for every request thread; the query threads have a pool of their own
+      'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': args.concurrency, 'max_overflow': 0},
+    })
+    init_migrate(app)
+    with app.app_context():
+      upgrade(directory=seeder.MIGRATIONS)
+      if not db.session.execute(text('SELECT count(*) FROM "Show"')).scalar():
+        print(seeder.seed(args.venues, args.artists, args.shows))
+      venue_ids = [i for i, in db.session.query(Venue.id)]
+      artist_ids = [i for i, in db.session.query(Artist.id)]
+      areas = db.session.query(Venue.city, Venue.state).distinct().all()
+      db.session.remove()
+
+    # one access log line per request would skew the numbers
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+      latencies, errors, elapsed = drive(server.port, args.concurrency, args.seconds,
+        lambda rng: urls(rng, venue_ids, artist_ids, areas))
+    finally:
+      server.shutdown()
+    print('parallel workers {:<3} {:8.1f} req/s  p50 {:8.2f} ms  p95 {:8.2f} ms  {} requests, {} errors'.format(
+      workers, len(latencies) / elapsed, percentile(latencies, 0.5) * 1000,
+      percentile(latencies, 0.95) * 1000, len(latencies), len(errors)))
+    for error in errors[:5]:
+      print('  ' + error)
+
+
+if __name__ == '__main__':
+  main()
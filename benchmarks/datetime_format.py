@@ -0,0 +1,51 @@
+"""Per-item cost of formatting show times for the listing pages.
+
+Compares the old path (str() -> dateutil parse -> babel.dates.format_datetime)
+with formatting.format_datetime and the batched formatting.format_datetimes.
+
+    python benchmarks/datetime_format.py --items 5000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import babel.dates
+import dateutil.parser
+
+from formatting import FORMATS, format_datetime, format_datetimes
+
+
+def reparse_and_format(value):
+  return babel.dates.format_datetime(dateutil.parser.parse(str(value)), FORMATS['full'], locale='en')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--items', type=int, default=2000)
+  parser.add_argument('--repeat', type=int, default=5)
+  args = parser.parse_args()
+
+  rng = random.Random(42)
+  start = datetime(2020, 1, 1, 20, 0)
+  # shows cluster on a few evening slots, like a real listing page
+  values = [start + timedelta(days=rng.randint(0, 365), hours=rng.choice([0, 1, 2]))
+            for _ in range(args.items)]
+
+  cases = [
+    ('dateutil + babel', lambda: [reparse_and_format(value) for value in values]),
+    ('format_datetime', lambda: [format_datetime(value, 'full') for value in values]),
+    ('format_datetimes', lambda: format_datetimes(values, 'full')),
+  ]
+  for name, run in cases:
+    best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+    print('{:<18} {:8.2f} us/item'.format(name, best / args.items * 1e6))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,95 @@
+"""Measures how long a fresh worker takes to import the app and build it.
+
+Each run starts a new interpreter, the way a gunicorn worker does, and
+times importing app.py plus calling create_app() (or, on commits from
+before the factory existed, importing the module-level app). --ref also
+measures another commit, checked out into a temporary directory, so the
+two can be compared side by side:
+
+    python benchmarks/import_time.py --ref HEAD~1
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# builds the app without touching the database; engines are created lazily,
+# and DATABASE_URL points the current config at an in-memory SQLite anyway
+PROBE = '''
+import sys, time
+started = time.perf_counter()
+import app
+getattr(app, 'create_app', lambda: app.app)()
+sys.stdout.write(repr(time.perf_counter() - started))
+'''
+
+
+def measure(directory, runs):
+  env = dict(os.environ, DATABASE_URL='sqlite://', PYTHONDONTWRITEBYTECODE='1')
+  timings = []
+  for _ in range(runs):
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=directory, env=env,
+      stderr=subprocess.DEVNULL)
+    timings.append(float(output) * 1000)
+  return timings
+
+
+def slowest_imports(directory, count):
+  # -X importtime prints "self | cumulative | name" for every module imported
+  env = dict(os.environ, DATABASE_URL='sqlite://', PYTHONDONTWRITEBYTECODE='1')
+  result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE],
+    cwd=directory, env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, check=True)
+  top_level = []
+  for line in result.stderr.decode().splitlines():
+    parts = line.split('|')
+    if len(parts) != 3 or not parts[1].strip().isdigit():
+      continue
+    name = parts[2]
+    # two spaces of indent: imported directly by the probe or by app.py
+    if len(name) - len(name.lstrip()) <= 3:
+      top_level.append((int(parts[1]), name.strip()))
+  return sorted(top_level, reverse=True)[:count]
+
+
+def checkout(ref):
+  directory = tempfile.mkdtemp(prefix='fyyur-import-')
+  archive = subprocess.Popen(['git', 'archive', ref], cwd=ROOT, stdout=subprocess.PIPE)
+  subprocess.check_call(['tar', '-x', '-C', directory], stdin=archive.stdout)
+  archive.wait()
+  return directory
+
+
+def report(label, directory, runs, top):
+  timings = measure(directory, runs)
+  print('{:<12} median {:8.1f} ms  min {:8.1f} ms  max {:8.1f} ms'.format(
+    label, statistics.median(timings), min(timings), max(timings)))
+  for cumulative, name in slowest_imports(directory, top):
+    print('    {:8.1f} ms  {}'.format(cumulative / 1000.0, name))
+  return statistics.median(timings)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--runs', type=int, default=20, help='Fresh interpreters per tree.')
+  parser.add_argument('--top', type=int, default=8, help='Slowest imports to list.')
+  parser.add_argument('--ref', help='Git commit to compare against, e.g. HEAD~1.')
+  args = parser.parse_args()
+
+  current = report('working tree', ROOT, args.runs, args.top)
+  if args.ref:
+    directory = checkout(args.ref)
+    try:
+      baseline = report(args.ref, directory, args.runs, args.top)
+    finally:
+      shutil.rmtree(directory)
+    print('change: {:+.1f} ms ({:+.1f}%)'.format(
+      current - baseline, (current - baseline) / baseline * 100))
+
+
+if __name__ == '__main__':
+  main()
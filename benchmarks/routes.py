@@ -0,0 +1,170 @@
+"""Drives every read route through the Flask test client and records latency
+and query counts.
+
+Seeds a scratch database with benchmarks/seed.py unless it already holds
+data, then requests each route --requests times with varying ids, genres
+and search terms. Results go to stdout and, with --output, to a JSON file
+that --compare can diff against a run from another commit.
+
+    python benchmarks/routes.py --output results.json
+    python benchmarks/routes.py --output new.json --compare results.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask_migrate import upgrade
+from sqlalchemy import event
+
+from app import create_app, init_migrate
+from extensions import db
+from models import Venue, Artist, Show, Genre
+import seed as seeder
+
+MIGRATIONS = os.path.join(ROOT, 'migrations')
+
+
+def routes(rng, venue_ids, artist_ids, genres, terms):
+  """(name, callable returning a URL) for every read route."""
+  # most traffic lands on a few popular pages; mix them with random ones
+  hot_venues, hot_artists = venue_ids[:20], artist_ids[:20]
+  return [
+    ('index', lambda: '/'),
+    ('venues', lambda: '/venues'),
+    ('venues by genre', lambda: '/venues?genre={}'.format(rng.choice(genres))),
+    ('venue detail hot', lambda: '/venues/{}'.format(rng.choice(hot_venues))),
+    ('venue detail', lambda: '/venues/{}'.format(rng.choice(venue_ids))),
+    ('artists', lambda: '/artists'),
+    ('artist detail hot', lambda: '/artists/{}'.format(rng.choice(hot_artists))),
+    ('artist detail', lambda: '/artists/{}'.format(rng.choice(artist_ids))),
+    ('shows', lambda: '/shows'),
+    ('search venues', lambda: '/venues/search?search_term={}'.format(rng.choice(terms))),
+    ('search artists', lambda: '/artists/search?search_term={}'.format(rng.choice(terms))),
+    ('api venues', lambda: '/api/v1/venues'),
+    ('api artists', lambda: '/api/v1/artists'),
+    ('api shows', lambda: '/api/v1/shows'),
+    ('api venue', lambda: '/api/v1/venues/{}'.format(rng.choice(venue_ids))),
+    ('api artist', lambda: '/api/v1/artists/{}'.format(rng.choice(artist_ids))),
+  ]
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(app, requests, rng):
+  queries = []
+  with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(1))
+    # the most-booked venues and artists first, so the "hot" routes hit them
+    venue_ids = [i for i, in db.session.query(Venue.id).order_by(Venue.past_shows_count.desc()).limit(1000)]
+    artist_ids = [i for i, in db.session.query(Artist.id).order_by(Artist.past_shows_count.desc()).limit(1000)]
+    genres = [name for name, in db.session.query(Genre.name)]
+  terms = ['City 1', 'Velvet', 'Room', 'Tigers', 'Golden Hall', 'CA', 'Neon']
+  client = app.test_client()
+
+  results = {}
+  for name, url in routes(rng, venue_ids, artist_ids, genres, terms):
+    latencies, counts, status = [], [], set()
+    for _ in range(requests):
+      del queries[:]
+      started = time.perf_counter()
+      response = client.get(url())
+      response.get_data()
+      latencies.append((time.perf_counter() - started) * 1000)
+      counts.append(len(queries))
+      status.add(response.status_code)
+    results[name] = {
+      'p50_ms': round(percentile(latencies, 0.50), 3),
+      'p95_ms': round(percentile(latencies, 0.95), 3),
+      'p99_ms': round(percentile(latencies, 0.99), 3),
+      'queries_max': max(counts),
+      'queries_mean': round(sum(counts) / float(len(counts)), 2),
+      'status': sorted(status),
+    }
+    print('{:<20} p50 {p50_ms:9.3f} ms  p95 {p95_ms:9.3f} ms  p99 {p99_ms:9.3f} ms  queries {queries_max}'.format(
+      name, **results[name]))
+  return results
+
+
+def compare(results, baseline):
+  print('\n{:<20} {:>12} {:>12} {:>8}'.format('route', 'base p95', 'p95', 'change'))
+  for name, result in results.items():
+    before = baseline['routes'].get(name)
+    if before is None:
+      continue
+    change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+    note = ''
+    if result['queries_max'] != before['queries_max']:
+      note = '  queries {} -> {}'.format(before['queries_max'], result['queries_max'])
+    print('{:<20} {:>9.3f} ms {:>9.3f} ms {:>+7.1f}%{}'.format(
+      name, before['p95_ms'], result['p95_ms'], change, note))
+
+
+def git_commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url',
+    default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur-routes.sqlite'))
+  parser.add_argument('--venues', type=int, default=1000)
+  parser.add_argument('--artists', type=int, default=3000)
+  parser.add_argument('--shows', type=int, default=100000)
+  parser.add_argument('--requests', type=int, default=50, help='Requests per route.')
+  parser.add_argument('--cache', action='store_true', help='Keep the response cache enabled.')
+  parser.add_argument('--output', help='Write results as JSON to this file.')
+  parser.add_argument('--compare', help='JSON results of an earlier run to diff against.')
+  args = parser.parse_args()
+
+  app = create_app({
+    'SQLALCHEMY_DATABASE_URI': args.database_url,
+    # measure the work behind each page, not cache hits
+    'CACHE_TYPE': 'lru' if args.cache else 'null',
+  })
+  init_migrate(app)
+  with app.app_context():
+    upgrade(directory=MIGRATIONS)
+    if not Show.query.first():
+      seeder.seed(args.venues, args.artists, args.shows)
+    volumes = {
+      'venues': Venue.query.count(),
+      'artists': Artist.query.count(),
+      'shows': Show.query.count(),
+    }
+    dialect = db.engine.dialect.name
+
+  results = run(app, args.requests, random.Random(42))
+  report = {
+    'commit': git_commit(),
+    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    'database': dialect,
+    'volumes': volumes,
+    'requests_per_route': args.requests,
+    'cache': args.cache,
+    'routes': results,
+  }
+  if args.output:
+    with open(args.output, 'w') as output:
+      json.dump(report, output, indent=2, sort_keys=True)
+  if args.compare:
+    with open(args.compare) as baseline:
+      compare(results, json.load(baseline))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,176 @@
+"""Fills a database with synthetic venues, artists and shows.
+
+Show counts per venue and per artist follow a Zipf-like curve, so a few
+venues host most of the shows, and venues and artists are spread over many
+cities the same way. Everything is seeded from --seed, so two runs with the
+same arguments produce the same data.
+
+    python benchmarks/seed.py --venues 5000 --artists 20000 --shows 500000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+from bisect import bisect
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask_migrate import upgrade
+from sqlalchemy import text
+
+from app import create_app, init_migrate
+from extensions import db
+from models import Venue, Artist, Show, Genre, venue_genres, artist_genres
+from queries import refresh_show_counts
+from forms import VenueForm
+
+MIGRATIONS = os.path.join(ROOT, 'migrations')
+STATES = [value for value, _ in VenueForm.state.kwargs['choices']]
+GENRES = [value for value, _ in VenueForm.genres.kwargs['choices']]
+WORDS = ['Blue', 'Red', 'Velvet', 'Golden', 'Iron', 'Electric', 'Silver', 'Midnight',
+         'Crystal', 'Wild', 'Lucky', 'Neon', 'Hollow', 'Northern', 'Paper', 'Royal']
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Theatre', 'Garage', 'Club', 'Tavern', 'Ballroom']
+ARTIST_NOUNS = ['Tigers', 'Echoes', 'Collective', 'Quartet', 'Kids', 'Machines', 'Saints', 'Owls']
+
+
+class Zipf(object):
+  """Draws indexes 0..n-1 with probability proportional to 1 / (rank ** s)."""
+
+  def __init__(self, n, s, rng):
+    self.rng = rng
+    self.cumulative = list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+  def draw(self):
+    return bisect(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+
+def chunks(rows, size):
+  for start in range(0, len(rows), size):
+    yield rows[start:start + size]
+
+
+def next_id(model):
+  return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def seed(venues=1000, artists=3000, shows=100000, cities=200, skew=1.1, seed=42, chunk=10000):
+  """Inserts the requested volumes with multi-row INSERTs and returns the
+  number of rows written per table."""
+  rng = random.Random(seed)
+  now = datetime.now()
+  areas = [('City {}'.format(i), rng.choice(STATES)) for i in range(cities)]
+  pick_area = Zipf(len(areas), skew, rng)
+
+  genre_ids = {}
+  for genre in Genre.query.filter(Genre.name.in_(GENRES)):
+    genre_ids[genre.name] = genre.id
+  missing = [{'name': name} for name in GENRES if name not in genre_ids]
+  if missing:
+    db.session.execute(Genre.__table__.insert(), missing)
+    for genre in Genre.query.filter(Genre.name.in_(GENRES)):
+      genre_ids[genre.name] = genre.id
+
+  # explicit ids so the association rows can be written with executemany too
+  first_venue, first_artist = next_id(Venue), next_id(Artist)
+  venue_rows, venue_links = [], []
+  for venue_id in range(first_venue, first_venue + venues):
+    city, state = areas[pick_area.draw()]
+    venue_rows.append({
+      'id': venue_id,
+      'name': 'The {} {} {}'.format(rng.choice(WORDS), rng.choice(VENUE_NOUNS), venue_id),
+      'city': city, 'state': state,
+      'address': '{} {} St'.format(rng.randint(1, 9999), rng.choice(WORDS)),
+      'phone': '{}-555-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 9999)),
+      'seeking_talent': rng.random() < 0.3,
+      'seeking_description': '',
+      'upcoming_shows_count': 0, 'past_shows_count': 0, 'version': 1,
+    })
+    for name in rng.sample(GENRES, rng.randint(1, 3)):
+      venue_links.append({'venue_id': venue_id, 'genre_id': genre_ids[name]})
+  artist_rows, artist_links = [], []
+  for artist_id in range(first_artist, first_artist + artists):
+    city, state = areas[pick_area.draw()]
+    artist_rows.append({
+      'id': artist_id,
+      'name': '{} {} {}'.format(rng.choice(WORDS), rng.choice(ARTIST_NOUNS), artist_id),
+      'city': city, 'state': state,
+      'phone': '{}-555-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 9999)),
+      'seeking_venue': rng.random() < 0.3,
+      'seeking_description': '',
+      'upcoming_shows_count': 0, 'past_shows_count': 0, 'version': 1,
+    })
+    for name in rng.sample(GENRES, rng.randint(1, 2)):
+      artist_links.append({'artist_id': artist_id, 'genre_id': genre_ids[name]})
+
+  for table, rows in ((Venue.__table__, venue_rows), (venue_genres, venue_links),
+                      (Artist.__table__, artist_rows), (artist_genres, artist_links)):
+    for part in chunks(rows, chunk):
+      db.session.execute(table.insert(), part)
+
+  # skewed popularity: a few venues and artists get most of the bookings
+  pick_venue = Zipf(venues, skew, rng)
+  pick_artist = Zipf(artists, skew, rng)
+  venue_order = list(range(first_venue, first_venue + venues))
+  artist_order = list(range(first_artist, first_artist + artists))
+  rng.shuffle(venue_order)
+  rng.shuffle(artist_order)
+  # at most one show a day per venue and per artist, so the schedule has no
+  # double bookings; draws that hit a taken day are redrawn
+  booked = set()
+  rows, written, attempts = [], 0, 0
+  while written < shows and attempts < shows * 20:
+    attempts += 1
+    venue_id = venue_order[pick_venue.draw()]
+    artist_id = artist_order[pick_artist.draw()]
+    # three years of history, one year of bookings, evening slots
+    day = rng.randint(-3 * 365, 365)
+    if ('venue', venue_id, day) in booked or ('artist', artist_id, day) in booked:
+      continue
+    booked.update((('venue', venue_id, day), ('artist', artist_id, day)))
+    start_time = (now + timedelta(days=day)).replace(
+      hour=rng.choice([19, 20, 21, 22]), minute=rng.choice([0, 30]), second=0, microsecond=0)
+    rows.append({
+      'venue_id': venue_id,
+      'artist_id': artist_id,
+      'start_time': start_time,
+      'end_time': start_time + Show.DEFAULT_DURATION,
+    })
+    written += 1
+    if len(rows) >= chunk:
+      db.session.execute(Show.__table__.insert(), rows)
+      rows = []
+  if rows:
+    db.session.execute(Show.__table__.insert(), rows)
+
+  if db.engine.dialect.name == 'postgresql':
+    for table in ('Venue', 'Artist'):
+      db.session.execute(text(
+        "SELECT setval(pg_get_serial_sequence('\"{0}\"', 'id'), (SELECT max(id) FROM \"{0}\"))".format(table)))
+  refresh_show_counts(now)
+  db.session.commit()
+  return {'venues': venues, 'artists': artists, 'shows': written, 'cities': cities}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url', help='Defaults to DATABASE_URL / config.py.')
+  parser.add_argument('--venues', type=int, default=1000)
+  parser.add_argument('--artists', type=int, default=3000)
+  parser.add_argument('--shows', type=int, default=100000)
+  parser.add_argument('--cities', type=int, default=200)
+  parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for popularity.')
+  parser.add_argument('--seed', type=int, default=42)
+  args = parser.parse_args()
+
+  app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url} if args.database_url else None)
+  init_migrate(app)
+  with app.app_context():
+    upgrade(directory=MIGRATIONS)
+    print(seed(args.venues, args.artists, args.shows, args.cities, args.skew, args.seed))
+
+
+if __name__ == '__main__':
+  main()
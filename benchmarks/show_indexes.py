@@ -0,0 +1,121 @@
+"""Compares the upcoming/past show queries before and after the Show indexes.
+
+Seeds a scratch database at the revision preceding c52e1d7f9a30, prints the
+query plan and timings for each hot query, applies the index migration and
+repeats the measurements.
+
+    python benchmarks/show_indexes.py --shows 500000
+    python benchmarks/show_indexes.py --database-url postgresql://localhost/fyyur-bench
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask_migrate import downgrade, upgrade
+from sqlalchemy import text
+
+from app import create_app, init_migrate
+from extensions import db
+
+MIGRATIONS = os.path.join(ROOT, 'migrations')
+BEFORE = '8d41f0c6b2a7'
+AFTER = 'c52e1d7f9a30'
+
+QUERIES = {
+  'venue upcoming shows':
+    'SELECT id, artist_id, start_time FROM "Show" WHERE venue_id = :venue_id AND start_time >= :now',
+  'artist past shows':
+    'SELECT id, venue_id, start_time FROM "Show" WHERE artist_id = :artist_id AND start_time < :now',
+  'shows feed page':
+    'SELECT id, venue_id, artist_id, start_time FROM "Show" WHERE start_time > :now ORDER BY start_time, id LIMIT 50',
+  'upcoming counts per venue':
+    'SELECT venue_id, count(id) FROM "Show" WHERE start_time > :now GROUP BY venue_id',
+}
+
+
+def seed(venues, artists, shows, chunk=10000):
+  # plain INSERTs rather than the models, which may be ahead of BEFORE
+  rng = random.Random(42)
+  now = datetime.now()
+  db.session.execute(text(
+    'INSERT INTO "Venue" (name, city, state, address, seeking_talent) '
+    'VALUES (:name, :city, :state, :address, :seeking_talent)'
+  ), [{
+    'name': 'Venue {}'.format(i), 'city': 'City {}'.format(i % 300), 'state': 'CA',
+    'address': '{} Main St'.format(i), 'seeking_talent': False
+  } for i in range(venues)])
+  db.session.execute(text(
+    'INSERT INTO "Artist" (name, city, state, seeking_venue) '
+    'VALUES (:name, :city, :state, :seeking_venue)'
+  ), [{
+    'name': 'Artist {}'.format(i), 'city': 'City {}'.format(i % 300), 'state': 'CA',
+    'seeking_venue': False
+  } for i in range(artists)])
+  for start in range(0, shows, chunk):
+    db.session.execute(text(
+      'INSERT INTO "Show" (venue_id, artist_id, start_time) VALUES (:venue_id, :artist_id, :start_time)'
+    ), [{
+      'venue_id': rng.randint(1, venues),
+      'artist_id': rng.randint(1, artists),
+      'start_time': now + timedelta(hours=rng.randint(-24 * 365 * 5, 24 * 365))
+    } for _ in range(start, min(start + chunk, shows))])
+  db.session.commit()
+
+
+def explain(sql, params):
+  prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+  rows = db.session.execute(text(prefix + sql), params).fetchall()
+  return [str(row[-1]) for row in rows]
+
+
+def measure(label, venues, artists, repeat):
+  now = datetime.now()
+  print('== {} =='.format(label))
+  for name, sql in QUERIES.items():
+    params = {'venue_id': 1, 'artist_id': 1, 'now': now}
+    for line in explain(sql, params):
+      print('  {:<28} {}'.format(name, line))
+    timings = []
+    for i in range(repeat):
+      params = {'venue_id': i % venues + 1, 'artist_id': i % artists + 1, 'now': now}
+      started = time.perf_counter()
+      db.session.execute(text(sql), params).fetchall()
+      timings.append(time.perf_counter() - started)
+    timings.sort()
+    print('  {:<28} p50 {:.3f} ms  p95 {:.3f} ms'.format(
+      name, timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000))
+  db.session.commit()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--database-url',
+    default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur-bench.sqlite'))
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=5000)
+  parser.add_argument('--shows', type=int, default=200000)
+  parser.add_argument('--repeat', type=int, default=50)
+  args = parser.parse_args()
+
+  app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url})
+  init_migrate(app)
+  with app.app_context():
+    # a database left over from a previous run is moved back to BEFORE
+    upgrade(directory=MIGRATIONS, revision=BEFORE)
+    downgrade(directory=MIGRATIONS, revision=BEFORE)
+    if not db.session.execute(text('SELECT count(*) FROM "Show"')).scalar():
+      seed(args.venues, args.artists, args.shows)
+    measure('before ' + AFTER, args.venues, args.artists, args.repeat)
+    upgrade(directory=MIGRATIONS, revision=AFTER)
+    measure('after ' + AFTER, args.venues, args.artists, args.repeat)
+
+
+if __name__ == '__main__':
+  main()
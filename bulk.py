@@ -0,0 +1,338 @@
+import io
+import csv
+import json
+import sqlite3
+import time
+from datetime import datetime
+
+import click
+from flask import Blueprint, Response, current_app, request, jsonify, abort, stream_with_context
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+import autocomplete
+import directory
+from extensions import db, cache
+from forms import VenueForm, ArtistForm, ShowForm
+from models import Venue, Artist, Show, ShowArchive, Genre, venue_genres, artist_genres
+from queries import refresh_show_counts, genres_by_name
+from scheduling import end_time_for, schedule_conflicts, existing_conflicts, describe
+
+# cli_group=None keeps `flask import-data` and `flask export-data` top level
+bp = Blueprint('bulk', __name__, cli_group=None)
+
+BULK_FIELDS = {
+  'venues': ['name', 'city', 'state', 'address', 'phone', 'image_link', 'website',
+             'facebook_link', 'genres', 'seeking_talent', 'seeking_description'],
+  'artists': ['name', 'city', 'state', 'phone', 'image_link', 'website',
+              'facebook_link', 'genres', 'seeking_venue', 'seeking_description'],
+  'shows': ['venue_id', 'artist_id', 'start_time', 'duration'],
+}
+
+def read_records(stream, format):
+  # yields (line number, record) from a binary CSV or NDJSON stream
+  text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+  if format == 'csv':
+    reader = csv.DictReader(text)
+    for record in reader:
+      # genres travel as one ';'-separated cell
+      if record.get('genres'):
+        record['genres'] = [name.strip() for name in record['genres'].split(';') if name.strip()]
+      yield reader.line_num, record
+  elif format == 'ndjson':
+    for number, line in enumerate(text, 1):
+      if line.strip():
+        yield number, json.loads(line)
+  else:
+    raise ValueError('Unknown format {!r}'.format(format))
+
+def validate_record(kind, record):
+  # runs the same WTForms rules as the create forms against one record
+  formdata = MultiDict()
+  for key, value in record.items():
+    if isinstance(value, list):
+      formdata.setlist(key, [str(item) for item in value])
+    elif isinstance(value, bool):
+      formdata[key] = 'y' if value else ''
+    elif value is not None:
+      formdata[key] = str(value)
+  form_class = {'venues': VenueForm, 'artists': ArtistForm, 'shows': ShowForm}[kind]
+  form = form_class(formdata=formdata, meta={'csrf': False})
+  form.validate()
+  return form
+
+def import_chunk(kind, chunk):
+  # chunk is a list of (line, form); returns {line: errors} for rejected rows
+  errors = {}
+  if kind == 'shows':
+    venue_ids = set(int(form.venue_id.data) for _, form in chunk)
+    artist_ids = set(int(form.artist_id.data) for _, form in chunk)
+    known_venues = set(i for i, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids)))
+    known_artists = set(i for i, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids)))
+    rows, lines = [], []
+    for line, form in chunk:
+      if int(form.venue_id.data) not in known_venues:
+        errors[line] = {'venue_id': ['Unknown venue.']}
+      elif int(form.artist_id.data) not in known_artists:
+        errors[line] = {'artist_id': ['Unknown artist.']}
+      else:
+        rows.append(show_row(form))
+        lines.append(line)
+    # double bookings, against the table and within the chunk, are rejected;
+    # within the chunk the earlier row wins
+    conflicts = schedule_conflicts(rows)
+    for index, messages in conflicts.items():
+      errors[lines[index]] = {'start_time': messages}
+    rows = [row for index, row in enumerate(rows) if index not in conflicts]
+    if rows:
+      # one executemany for the whole chunk
+      db.session.execute(Show.__table__.insert(), rows)
+      refresh_show_counts(
+        datetime.now(),
+        venue_ids=set(row['venue_id'] for row in rows),
+        artist_ids=set(row['artist_id'] for row in rows)
+      )
+    return errors, len(rows)
+
+  model = Venue if kind == 'venues' else Artist
+  links, key = (venue_genres, 'venue_id') if kind == 'venues' else (artist_genres, 'artist_id')
+  seeking = 'seeking_talent' if kind == 'venues' else 'seeking_venue'
+  # one lookup for every genre named in the chunk; only new names are inserted
+  genres = dict((genre.name, genre) for genre in genres_by_name(
+    sorted(set(name for _, form in chunk for name in form.genres.data))))
+  db.session.add_all(genres.values())
+  db.session.flush()
+  rows = []
+  for _, form in chunk:
+    row = dict((field, form[field].data) for field in BULK_FIELDS[kind] if field != 'genres')
+    if not row[seeking]:
+      row['seeking_description'] = ''
+    rows.append(row)
+  if not rows:
+    return errors, 0
+  ids = insert_returning_ids(model.__table__, rows)
+  genre_rows = [{key: entity_id, 'genre_id': genres[name].id}
+    for entity_id, (_, form) in zip(ids, chunk) for name in set(form.genres.data)]
+  if genre_rows:
+    db.session.execute(links.insert(), genre_rows)
+  return errors, len(rows)
+
+# Most bind parameters one statement may carry; SQLite before 3.32 allowed 999
+BIND_PARAMETER_LIMITS = {
+  'postgresql': 65535,
+  'sqlite': 32766 if sqlite3.sqlite_version_info >= (3, 32) else 999,
+}
+
+def insert_returning_ids(table, rows):
+  # Multi-row INSERTs of as many rows as the dialect's parameter limit
+  # allows; returns the new ids in row order.
+  dialect = db.engine.dialect.name
+  if dialect not in BIND_PARAMETER_LIMITS:
+    return [db.session.execute(table.insert(), row).inserted_primary_key[0] for row in rows]
+  # every column may be bound, the ones given and the ones with a default
+  per_statement = max(1, BIND_PARAMETER_LIMITS[dialect] // len(table.c))
+  ids = []
+  for start in range(0, len(rows), per_statement):
+    batch = rows[start:start + per_statement]
+    if dialect == 'postgresql':
+      ids.extend(entity_id for entity_id, in db.session.execute(table.insert().values(batch).returning(table.c.id)))
+    else:
+      # SQLite gives the rows of one INSERT consecutive rowids after the
+      # highest one in the table (the ids aren't AUTOINCREMENT, and the
+      # statement holds the write lock), so the last rowid gives them all
+      last = db.session.execute(table.insert().values(batch)).lastrowid
+      ids.extend(range(last - len(batch) + 1, last + 1))
+  return ids
+
+def show_row(form):
+  return {
+    'venue_id': int(form.venue_id.data),
+    'artist_id': int(form.artist_id.data),
+    'start_time': form.start_time.data,
+    'end_time': end_time_for(form.start_time.data, form.duration.data)
+  }
+
+def import_records(kind, records, chunk_size=None):
+  """Validates and inserts records in chunks, one transaction per chunk.
+
+  Returns a report with counts, per-row errors and throughput.
+  """
+  chunk_size = chunk_size or current_app.config['BULK_CHUNK_SIZE']
+  report = {'read': 0, 'inserted': 0, 'errors': []}
+  started = time.perf_counter()
+  chunk = []
+
+  def flush_chunk():
+    try:
+      errors, inserted = import_chunk(kind, chunk)
+      db.session.commit()
+    except SQLAlchemyError as e:
+      db.session.rollback()
+      errors, inserted = dict((line, {'database': [str(e.orig if hasattr(e, 'orig') else e)]}) for line, _ in chunk), 0
+    report['inserted'] += inserted
+    report['errors'].extend({'line': line, 'errors': error} for line, error in sorted(errors.items()))
+    del chunk[:]
+
+  for line, record in records:
+    report['read'] += 1
+    form = validate_record(kind, record)
+    if form.errors:
+      report['errors'].append({'line': line, 'errors': form.errors})
+      continue
+    chunk.append((line, form))
+    if len(chunk) >= chunk_size:
+      flush_chunk()
+  if chunk:
+    flush_chunk()
+
+  report['errors'].sort(key=lambda error: error['line'])
+  elapsed = time.perf_counter() - started
+  report['seconds'] = round(elapsed, 3)
+  report['rows_per_second'] = round(report['read'] / elapsed, 1) if elapsed else None
+  if kind != 'artists':
+    directory.rebuild()
+    db.session.commit()
+  cache.clear()
+  if kind != 'shows':
+    autocomplete.invalidate()
+  return report
+
+def export_records(kind, format, chunk_size=None):
+  """Yields the rows of kind as CSV or NDJSON text, reading in id order one
+  chunk at a time so memory stays flat."""
+  chunk_size = chunk_size or current_app.config['BULK_CHUNK_SIZE']
+  fields = ['id'] + BULK_FIELDS[kind]
+  # archived shows first: they are the older ones
+  models = {'venues': [Venue], 'artists': [Artist], 'shows': [ShowArchive, Show]}[kind]
+  links = {'venues': venue_genres.c.venue_id, 'artists': artist_genres.c.artist_id}.get(kind)
+  if format == 'csv':
+    yield csv_line(fields)
+  for model in models:
+    last_id = 0
+    while True:
+      rows = model.query.filter(model.id > last_id).order_by(model.id).limit(chunk_size).all()
+      if not rows:
+        break
+      last_id = rows[-1].id
+      genres = {}
+      if links is not None:
+        for entity_id, name in db.session.query(links, Genre.name).join(
+            Genre, Genre.id == links.table.c.genre_id).filter(links.in_([row.id for row in rows])):
+          genres.setdefault(entity_id, []).append(name)
+      for row in rows:
+        record = {}
+        for field in fields:
+          if field == 'genres':
+            record[field] = sorted(genres.get(row.id, []))
+          else:
+            value = getattr(row, field)
+            record[field] = value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value
+        if format == 'csv':
+          yield csv_line([export_cell(record[field]) for field in fields])
+        else:
+          yield json.dumps(record) + '\n'
+      db.session.expunge_all()
+
+def csv_line(values):
+  buffer = io.StringIO()
+  csv.writer(buffer).writerow(values)
+  return buffer.getvalue()
+
+def export_cell(value):
+  if isinstance(value, list):
+    return ';'.join(value)
+  if isinstance(value, bool):
+    return 'y' if value else ''
+  return '' if value is None else value
+
+#----------------------------------------------------------------------------#
+# Routes and commands.
+#----------------------------------------------------------------------------#
+
+
+def bulk_format(filename, format=None):
+  format = format or filename.rsplit('.', 1)[-1].lower()
+  if format == 'json':
+    format = 'ndjson'
+  return format if format in ('csv', 'ndjson') else None
+
+@bp.route('/import/<any(venues, artists, shows):kind>', methods=['POST'])
+def import_upload(kind):
+  upload = request.files.get('file')
+  if upload is None:
+    abort(400)
+  format = bulk_format(upload.filename, request.form.get('format'))
+  if format is None:
+    abort(400)
+  report = import_records(kind, read_records(upload.stream, format))
+  return jsonify(report), 200 if not report['errors'] else 422
+
+@bp.route('/export/<any(venues, artists, shows):kind>.<any(csv, ndjson):format>')
+@db.read_only
+def export_download(kind, format):
+  mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+  response = Response(stream_with_context(export_records(kind, format)), mimetype=mimetype)
+  response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(kind, format)
+  return response
+
+@bp.cli.command('import-data')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', type=int, help='Rows per transaction (BULK_CHUNK_SIZE).')
+def import_data_command(kind, path, format, chunk_size):
+  """Imports venues, artists or shows from a CSV or NDJSON file."""
+  format = bulk_format(path, format)
+  if format is None:
+    raise click.BadParameter('use --format for files without a .csv or .ndjson extension')
+  with open(path, 'rb') as stream:
+    report = import_records(kind, read_records(stream, format), chunk_size)
+  for error in report['errors']:
+    click.echo('line {}: {}'.format(error['line'], json.dumps(error['errors'])), err=True)
+  click.echo('{read} read, {inserted} inserted, {failed} rejected in {seconds}s ({rows_per_second} rows/s)'.format(
+    failed=len(report['errors']), **report))
+
+@bp.cli.command('export-data')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), default='csv')
+@click.option('--output', '-o', type=click.File('w'), default='-')
+def export_data_command(kind, format, output):
+  """Exports venues, artists or shows as CSV or NDJSON."""
+  for chunk in export_records(kind, format):
+    output.write(chunk)
+
+@bp.cli.command('check-schedule')
+@click.argument('path', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+def check_schedule_command(path, format):
+  """Lists overlapping venue or artist bookings.
+
+  With PATH, checks the shows in a CSV or NDJSON file against the database
+  and against each other without importing them. Without it, lists the
+  overlaps already in the Show table. Exits with status 1 if any are found.
+  """
+  found = 0
+  if path:
+    format = bulk_format(path, format)
+    if format is None:
+      raise click.BadParameter('use --format for files without a .csv or .ndjson extension')
+    rows, lines = [], []
+    with open(path, 'rb') as stream:
+      for line, record in read_records(stream, format):
+        form = validate_record('shows', record)
+        if form.errors:
+          click.echo('line {}: {}'.format(line, json.dumps(form.errors)), err=True)
+          continue
+        rows.append(show_row(form))
+        lines.append(line)
+    for index, messages in sorted(schedule_conflicts(rows).items()):
+      found += 1
+      for message in messages:
+        click.echo('line {}: {}'.format(lines[index], message))
+  else:
+    for key, first, second in existing_conflicts():
+      found += 1
+      click.echo('{} overlaps {}'.format(describe(second), describe(first)))
+  click.echo('{} conflicting booking(s)'.format(found), err=True)
+  if found:
+    raise SystemExit(1)
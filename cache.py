@@ -0,0 +1,258 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, g, make_response, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class LRUBackend(object):
+    """In-process cache holding at most `size` entries, least recently used
+    evicted first. Each worker process keeps its own copy."""
+
+    def __init__(self, size=1024, timeout=None):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires, _ = entry
+            if expires is not None and expires < time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags):
+        expires = time.time() + self.timeout if self.timeout else None
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, expires, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.size:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate(self, tags):
+        with self.lock:
+            for tag in tags:
+                for key in list(self.tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+
+    def _remove(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisBackend(object):
+    """Cache shared by every worker through a Redis-protocol server. Each
+    tag is a set holding the keys of the entries it covers."""
+
+    def __init__(self, url, prefix='fyyur:', timeout=None):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, tags):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value.encode('utf-8'), ex=self.timeout)
+        for tag in tags:
+            pipe.sadd(self.prefix + 'tag:' + tag, self.prefix + key)
+            if self.timeout:
+                pipe.expire(self.prefix + 'tag:' + tag, self.timeout)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        tag_keys = [self.prefix + 'tag:' + tag for tag in tags]
+        if not tag_keys:
+            return
+        keys = self.client.sunion(tag_keys)
+        self.client.delete(*(list(keys) + tag_keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class NullBackend(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags):
+        pass
+
+    def invalidate(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+class ResponseCache(object):
+    """Caches rendered pages keyed by endpoint and arguments.
+
+    Views decorated with `cached` call `tag()` with the entities they render
+    (e.g. 'venue:3', 'area:San Francisco/CA'); handlers that change those
+    entities call `invalidate()` with the same tags after committing.
+
+    Configured with CACHE_TYPE ('lru', 'redis' or 'null'), CACHE_SIZE,
+    CACHE_REDIS_URL and CACHE_TIMEOUT (seconds).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'lru')
+        timeout = app.config.get('CACHE_TIMEOUT')
+        if cache_type == 'lru':
+            backend = LRUBackend(app.config.get('CACHE_SIZE', 1024), timeout)
+        elif cache_type == 'redis':
+            backend = RedisBackend(app.config['CACHE_REDIS_URL'], timeout=timeout)
+        elif cache_type == 'null':
+            backend = NullBackend()
+        else:
+            raise ValueError('Unknown CACHE_TYPE {!r}'.format(cache_type))
+        app.extensions['response_cache'] = backend
+        # rendered template fragments stay in the process: a page has many
+        # of them, and a round trip each to Redis would cost more than
+        # rendering. Their keys carry row versions, so other workers' edits
+        # can't leave them stale.
+        app.extensions['fragment_cache'] = (
+            NullBackend() if cache_type == 'null' else
+            LRUBackend(app.config.get('FRAGMENT_CACHE_SIZE', 10000), timeout))
+        app.jinja_env.add_extension(FragmentCacheExtension)
+
+    @property
+    def backend(self):
+        # each application keeps its own backend, so tests can build apps
+        # with different CACHE_TYPEs side by side
+        return current_app.extensions.get('response_cache', NullBackend())
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # pending flash messages are per user and must not be cached or skipped
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            key = self.make_key()
+            body = self.backend.get(key)
+            if body is not None:
+                return body
+            g.cache_tags = set()
+            body = view(*args, **kwargs)
+            if isinstance(body, str):
+                self.backend.set(key, body, g.cache_tags)
+            return body
+        return wrapper
+
+    def conditional(self, fingerprint):
+        """Answers GETs whose If-None-Match matches with 304 before the view
+        (or the cache) runs.
+
+        fingerprint takes the view's arguments and returns a small
+        JSON-able value that changes whenever the page would, e.g. the
+        version columns of the rows it shows, or None to skip the check.
+        The ETag also names the static asset build, so a deploy doesn't
+        answer 304 with a page from the last one.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+                value = fingerprint(*args, **kwargs)
+                if value is None:
+                    return view(*args, **kwargs)
+                etag = hashlib.md5(json.dumps(
+                    [request.path, current_app.extensions.get('static_assets', {}).get('version'), value],
+                    default=str).encode()).hexdigest()
+                if request.if_none_match.contains(etag):
+                    response = Response(status=304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                response.set_etag(etag)
+                # browsers keep the page but check back every time
+                response.cache_control.no_cache = True
+                return response
+            return wrapper
+        return decorator
+
+    def make_key(self):
+        args = sorted(request.args.items(multi=True))
+        return 'view:{}:{}:{}'.format(
+            request.endpoint,
+            json.dumps(request.view_args, sort_keys=True),
+            json.dumps(args)
+        )
+
+    def tag(self, *tags):
+        if 'cache_tags' in g:
+            g.cache_tags.update(tags)
+
+    def invalidate(self, *tags):
+        self.backend.invalidate(tags)
+        current_app.extensions.get('fragment_cache', NullBackend()).invalidate(tags)
+
+    def clear(self):
+        self.backend.clear()
+        current_app.extensions.get('fragment_cache', NullBackend()).clear()
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'venue', venue.id, venue.version %}...{% endcache %}
+
+    Caches the rendered block under all of its arguments. The first two
+    name the tag ('venue:3') that ResponseCache.invalidate() drops it by;
+    the rest, typically row versions, make an edited row miss.
+    """
+
+    tags = set(['cache'])
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(parts)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        backend = current_app.extensions.get('fragment_cache', NullBackend())
+        key = 'fragment:' + json.dumps(parts, default=str)
+        body = backend.get(key)
+        if body is None:
+            body = caller()
+            backend.set(key, body, ['{}:{}'.format(*parts[:2])] if len(parts) > 1 else [])
+        return Markup(body)
@@ -1,13 +1,92 @@
 import os
-SECRET_KEY = os.urandom(32)
+from flask.helpers import get_debug_flag
+
+# Deployment settings come from the environment so each worker, test run or
+# Heroku dyno can point at its own database without editing this file.
+# FYYUR_SETTINGS may name a further Python file of overrides.
+
+# Set SECRET_KEY when running several workers, or their sessions won't match
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Debug mode follows FLASK_DEBUG / FLASK_ENV=development, as `flask run` does
+DEBUG = get_debug_flag()
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://localhost:5432/fyyurapp-db1')
+# nothing listens for Flask-SQLAlchemy's model change signals
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool of each worker process. pre-ping replaces connections the
+# server dropped, recycle retires them before proxies or Postgres time them
+# out. SQLite ignores the size settings: it opens a connection per checkout.
+SQLALCHEMY_ENGINE_OPTIONS = {
+  'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+  'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+  'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+  'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+  'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1').lower() not in ('0', 'false', 'no'),
+}
+
+# Read replicas, comma-separated in DATABASE_REPLICA_URLS. Listing and
+# detail pages read from them; after a form submission the client reads
+# from the primary for REPLICA_STICKY_SECONDS, which should exceed the lag
+SQLALCHEMY_REPLICA_URIS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+REPLICA_STICKY_SECONDS = 10
+
+# Number of rows per page on the shows, artists and search listings
+PAGE_SIZE = 50
+
+# Response cache for the listing and detail pages: 'lru' (per process),
+# 'redis' (shared, needs CACHE_REDIS_URL) or 'null' to disable
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+CACHE_SIZE = 1024
+CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+# Seconds before an entry expires; pages split past/upcoming shows by time
+CACHE_TIMEOUT = 300
+# Rendered fragments ({% cache %} blocks) kept per process
+FRAGMENT_CACHE_SIZE = 10000
+
+# Rows fetched per round trip when streaming API collections
+API_YIELD_PER = 1000
+
+# Rows validated and inserted per transaction by the bulk import/export
+BULK_CHUNK_SIZE = 1000
+
+# `flask archive-shows` moves shows that ended longer ago than this into
+# ShowArchive, which only past-show listings read
+SHOW_ARCHIVE_HORIZON_DAYS = 365
+
+# Query instrumentation: statements slower than this are logged and listed
+# on /metrics; Server-Timing headers default to on in debug mode
+SLOW_QUERY_SECONDS = 0.1
+SLOW_QUERY_KEEP = 20
+SERVER_TIMING = DEBUG
+
+# JSON logs, one object per line, written by a background thread: to
+# LOG_FILE, or to stderr when it is empty (the default in debug mode).
+# LOG_INFO_SAMPLE_RATE keeps that fraction of requests' INFO records,
+# including the per-request access line; warnings and errors are all kept.
+LOG_FILE = os.environ.get('LOG_FILE', '' if DEBUG else 'error.log')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_INFO_SAMPLE_RATE = float(os.environ.get('LOG_INFO_SAMPLE_RATE', 1.0))
+LOG_REQUESTS = True
+
+# The independent queries of the detail, search and availability pages run
+# at the same time on a pool of this many threads per worker process. The
+# threads have a connection pool of their own, this size, so each worker
+# may open this many connections on top of DB_POOL_SIZE + DB_MAX_OVERFLOW.
+# 0 runs the queries one after another.
+PARALLEL_QUERY_WORKERS = int(os.environ.get('PARALLEL_QUERY_WORKERS', 8))
 
+# Search box suggestions are served from an in-memory index in each worker,
+# rebuilt from the database when older than this many seconds to pick up
+# other workers' changes
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_REBUILD_SECONDS = 300
 
-# IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://fyyurapp:[6QG]{GBR|<h[6@localhost:5432/fyyurapp-db1' 
+# /venues is served from per-area snapshots held by each worker; a worker
+# rereads them from the database when its copy is older than this, to pick
+# up other workers' changes
+DIRECTORY_RELOAD_SECONDS = 60
@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import click
+from flask import Blueprint, current_app
+from sqlalchemy import and_, event, or_, text
+from sqlalchemy.dialects import postgresql
+
+from extensions import db
+from models import Venue, Genre, VenueDirectory, venue_genres
+from routing import RoutingSession
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# cli_group=None keeps `flask build-venue-directory` top level
+bp = Blueprint('directory', __name__, cli_group=None)
+
+lock = threading.Lock()
+
+
+#----------------------------------------------------------------------------#
+# Snapshots.
+#----------------------------------------------------------------------------#
+
+# /venues lists every venue grouped by area. Instead of querying for it on
+# each request, every (city, state) area's listing is kept as a blob in the
+# VenueDirectory table: its venues as [id, name, upcoming shows, version,
+# genres] lists, in name order. The handlers that change a venue or its
+# upcoming show count call refresh() before they commit, so the blobs
+# change in the same transaction. Each worker process serves /venues from
+# a decoded copy; its own commits update the copy, and it reloads the
+# table once the copy is DIRECTORY_RELOAD_SECONDS old to pick up the
+# changes of other workers.
+
+def encode(venues):
+    # msgpack when installed, else compressed JSON; the first byte says which
+    if msgpack is not None:
+        return b'm' + msgpack.packb(venues, use_bin_type=True)
+    return b'z' + zlib.compress(json.dumps(venues, separators=(',', ':')).encode('utf-8'))
+
+def decode(blob):
+    # None for a msgpack blob in a worker without msgpack
+    blob = bytes(blob)
+    if blob[:1] == b'm':
+        return msgpack.unpackb(blob[1:], raw=False) if msgpack is not None else None
+    return json.loads(zlib.decompress(blob[1:]).decode('utf-8'))
+
+def in_areas(areas, model=Venue):
+    return or_(*[and_(model.city == city, model.state == state) for city, state in areas])
+
+def query_areas(areas=None):
+    """{(city, state): venues} read from Venue for the given areas, or for
+    every area; two queries."""
+    venues = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state,
+        Venue.upcoming_shows_count, Venue.version)
+    genres = db.session.query(venue_genres.c.venue_id, Genre.name).join(
+        Genre, Genre.id == venue_genres.c.genre_id)
+    if areas is not None:
+        venues = venues.filter(in_areas(areas))
+        genres = genres.join(Venue, Venue.id == venue_genres.c.venue_id).filter(in_areas(areas))
+    names = {}
+    for venue_id, name in genres:
+        names.setdefault(venue_id, []).append(name)
+    built = {}
+    for venue_id, name, city, state, upcoming, version in venues.order_by(Venue.name, Venue.id):
+        built.setdefault((city, state), []).append(
+            [venue_id, name, upcoming, version, sorted(names.get(venue_id, []))])
+    return built
+
+def rows(built):
+    now = datetime.now()
+    return [{'city': city, 'state': state, 'data': encode(venues), 'built_at': now}
+        for (city, state), venues in built.items()]
+
+# Writers that change the same area at the same time must take turns, each
+# recomputing the area from what the one before it committed. SQLite runs
+# one write transaction at a time, and the handlers have written by the
+# time they refresh, so there they already do. On Postgres refresh() makes
+# sure each area has a row, locks those rows in (city, state) order, reads
+# Venue and then updates the rows in place with INSERT ... ON CONFLICT DO
+# UPDATE, so two writers never both insert an area's row; rebuild() locks
+# the whole table against them.
+
+def lock_areas(areas):
+    if db.engine.dialect.name != 'postgresql':
+        return
+    table = VenueDirectory.__table__
+    # a placeholder for a new area; waits for another writer's new row
+    db.session.execute(postgresql.insert(table).on_conflict_do_nothing(
+        index_elements=[table.c.city, table.c.state]), rows(dict((area, []) for area in areas)))
+    db.session.query(VenueDirectory.city).filter(in_areas(areas, VenueDirectory)).order_by(
+        VenueDirectory.city, VenueDirectory.state).with_for_update().all()
+
+def rebuild():
+    """Rewrites every area's snapshot in the current transaction; returns
+    the number of areas."""
+    if db.engine.dialect.name == 'postgresql':
+        # readers go on; refresh() in other transactions waits
+        db.session.execute(text('LOCK TABLE "VenueDirectory" IN EXCLUSIVE MODE'))
+    built = query_areas()
+    VenueDirectory.query.delete(synchronize_session=False)
+    if built:
+        db.session.execute(VenueDirectory.__table__.insert(), rows(built))
+    db.session.info['venue_directory'] = (built, {})
+    return len(built)
+
+def refresh(areas=(), venue_ids=()):
+    """Rewrites the snapshots of the given (city, state) areas and of the
+    areas of venue_ids in the current transaction. Call it after making the
+    change and before committing; pass both areas of a venue that moved."""
+    areas = set((city, state) for city, state in areas)
+    if venue_ids:
+        areas.update((city, state) for city, state in db.session.query(
+            Venue.city, Venue.state).filter(Venue.id.in_(list(venue_ids))).distinct())
+    if not areas:
+        return
+    if db.session.query(VenueDirectory.city).first() is None:
+        # never built: a few areas alone would hide all the others
+        rebuild()
+        return
+    areas = sorted(areas)
+    lock_areas(areas)
+    built = query_areas(areas)
+    if db.engine.dialect.name == 'postgresql':
+        # a writer waiting on a row that is deleted goes on without the
+        # lock, so only areas left without venues lose theirs
+        empty = [area for area in areas if area not in built]
+        if empty:
+            VenueDirectory.query.filter(in_areas(empty, VenueDirectory)).delete(synchronize_session=False)
+        if built:
+            table = VenueDirectory.__table__
+            upsert = postgresql.insert(table)
+            db.session.execute(upsert.on_conflict_do_update(index_elements=[table.c.city, table.c.state],
+                set_={'data': upsert.excluded.data, 'built_at': upsert.excluded.built_at}), rows(built))
+    else:
+        VenueDirectory.query.filter(in_areas(areas, VenueDirectory)).delete(synchronize_session=False)
+        if built:
+            db.session.execute(VenueDirectory.__table__.insert(), rows(built))
+    full, changes = db.session.info.get('venue_directory', (None, {}))
+    # None marks an area left without venues
+    changes.update((area, built.get(area)) for area in areas)
+    db.session.info['venue_directory'] = (full, changes)
+
+
+#----------------------------------------------------------------------------#
+# The worker's copy.
+#----------------------------------------------------------------------------#
+
+@bp.record_once
+def setup(state):
+    state.app.config.setdefault('DIRECTORY_RELOAD_SECONDS', 60)
+    state.app.extensions['venue_directory'] = {'areas': {}, 'listing': [], 'loaded': None}
+    if not event.contains(RoutingSession, 'after_commit', publish):
+        event.listen(RoutingSession, 'after_commit', publish)
+        event.listen(RoutingSession, 'after_soft_rollback', discard)
+
+def install(app, full=None, changes=None):
+    state = app.extensions['venue_directory']
+    with lock:
+        areas = dict(full if full is not None else state['areas'])
+        for area, venues in (changes or {}).items():
+            if venues:
+                areas[area] = venues
+            else:
+                areas.pop(area, None)
+        state['areas'] = areas
+        state['listing'] = sorted(areas.items(), key=lambda item: (item[0][1], item[0][0]))
+        if full is not None:
+            state['loaded'] = time.time()
+
+def publish(session):
+    staged = session.info.pop('venue_directory', None)
+    if staged is not None:
+        install(session.app, *staged)
+
+def discard(session, previous_transaction):
+    session.info.pop('venue_directory', None)
+
+def load():
+    """Replaces the worker's copy with the table's snapshots, or with the
+    directory built from Venue while the table is still empty."""
+    built, stale = {}, []
+    for city, state, data in db.session.query(VenueDirectory.city, VenueDirectory.state, VenueDirectory.data):
+        venues = decode(data)
+        if venues is None:
+            stale.append((city, state))
+        else:
+            built[(city, state)] = venues
+    if stale:
+        built.update(query_areas(stale))
+    elif not built:
+        built = query_areas()
+    install(current_app, built)
+
+def listing():
+    """[((city, state), venues)] in (state, city) order."""
+    state = current_app.extensions['venue_directory']
+    reload = current_app.config['DIRECTORY_RELOAD_SECONDS']
+    if state['loaded'] is None or (reload is not None and state['loaded'] + reload < time.time()):
+        load()
+    return state['listing']
+
+@bp.cli.command('build-venue-directory')
+def build_venue_directory_command():
+    """Rewrites the /venues snapshot of every area.
+
+    Run it once after the migration that adds VenueDirectory; the app keeps
+    the snapshots current from then on.
+    """
+    areas = rebuild()
+    db.session.commit()
+    click.echo('{} area(s)'.format(areas))
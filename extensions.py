@@ -0,0 +1,15 @@
+from cache import ResponseCache
+from instrumentation import QueryStats
+from logs import StructuredLogging
+from parallel import ParallelQueries
+from routing import RoutingSQLAlchemy
+from static_assets import StaticAssets
+
+# Created unbound so models and blueprints can import them; create_app()
+# binds each one to the application it builds.
+db = RoutingSQLAlchemy()
+cache = ResponseCache()
+query_stats = QueryStats()
+assets = StaticAssets()
+parallel = ParallelQueries()
+logs = StructuredLogging()
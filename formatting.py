@@ -0,0 +1,45 @@
+from datetime import datetime
+from functools import lru_cache
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+    # parsing a CLDR pattern and loading locale data are the expensive part
+    # of babel.dates.format_datetime; do each once per (format, locale)
+    from babel.core import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    import dateutil.parser
+    return dateutil.parser.parse(value)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    """Formats a datetime (or a date string) with a named or CLDR pattern.
+
+    Naive datetimes are formatted as-is, without a timezone conversion.
+    """
+    pattern, locale = compiled_pattern(format, locale)
+    return pattern.apply(to_datetime(value), locale)
+
+
+def format_datetimes(values, format='medium', locale='en'):
+    """Formats a sequence of datetimes with one pattern lookup, reusing the
+    result for repeated values."""
+    pattern, locale = compiled_pattern(format, locale)
+    formatted = {}
+    result = []
+    for value in values:
+        if value not in formatted:
+            formatted[value] = pattern.apply(to_datetime(value), locale)
+        result.append(formatted[value])
+    return result
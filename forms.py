@@ -1,20 +1,58 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import AnyOf, DataRequired, Regexp, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, DateField, BooleanField, IntegerField, TextAreaField
+from wtforms.validators import ValidationError, DataRequired, NumberRange, Optional, Regexp, URL
+from models import Show
+from scheduling import MAX_OCCURRENCES
 
 class ShowForm(Form):
     artist_id = StringField(
-        'artist_id'
+        'artist_id', validators=[DataRequired(), Regexp(r'^\d+$', message='Not a valid id.')]
     )
     venue_id = StringField(
-        'venue_id'
+        'venue_id', validators=[DataRequired(), Regexp(r'^\d+$', message='Not a valid id.')]
     )
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # minutes; a show can't run past Show.MAX_DURATION
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=int(Show.MAX_DURATION.total_seconds() // 60))],
+        default=int(Show.DEFAULT_DURATION.total_seconds() // 60)
+    )
+    # recurring shows: start_time is the first occurrence
+    repeat = SelectField(
+        'repeat', validators=[Optional()],
+        choices=[
+            ('', 'Does not repeat'),
+            ('weekly', 'Weekly'),
+            ('monthly', 'Monthly'),
+            ('rrule', 'Custom rule'),
+            ('dates', 'List of dates'),
+        ],
+        default=''
+    )
+    interval = IntegerField(
+        'interval', validators=[Optional(), NumberRange(min=1, max=52)],
+        default=1
+    )
+    count = IntegerField(
+        'count', validators=[Optional(), NumberRange(min=1, max=MAX_OCCURRENCES)]
+    )
+    until = DateField(
+        'until', validators=[Optional()]
+    )
+    # an iCalendar RRULE such as FREQ=WEEKLY;BYDAY=FR,SA;COUNT=10
+    rrule = StringField(
+        'rrule', validators=[Optional()]
+    )
+    # one date or date and time per line; a bare date takes start_time's time
+    dates = TextAreaField(
+        'dates', validators=[Optional()]
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -232,4 +270,35 @@ class ArtistForm(Form):
     seeking_description = StringField(
         'seeking_description' 
     )
+
+class AvailabilityForm(Form):
+    # a GET form: availability searches are bookmarkable
+    class Meta:
+        csrf = False
+
+    state = SelectField(
+        'state', validators=[DataRequired()],
+        choices=VenueForm.state.kwargs['choices']
+    )
+    city = StringField(
+        'city', validators=[Optional()]
+    )
+    genres = SelectMultipleField(
+        'genres', validators=[Optional()],
+        choices=VenueForm.genres.kwargs['choices']
+    )
+    start = DateField(
+        'start', validators=[DataRequired()],
+        default=date.today
+    )
+    # inclusive: the window runs to midnight after this day
+    end = DateField(
+        'end', validators=[DataRequired()],
+        default=lambda: date.today() + timedelta(days=6)
+    )
+
+    def validate_end(self, field):
+        if self.start.data and field.data and field.data < self.start.data:
+            raise ValidationError('The window must end on or after its start.')
+
 # TODO IMPLEMENT NEW ARTIST FORM AND NEW SHOW FORM
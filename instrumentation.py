@@ -0,0 +1,146 @@
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats(object):
+    """Counts SQL statements and database time per request.
+
+    - Server-Timing headers (on in debug mode, or with SERVER_TIMING = True)
+    - a Prometheus text endpoint at METRICS_PATH (default /metrics)
+    - statements slower than SLOW_QUERY_SECONDS are logged and the
+      SLOW_QUERY_KEEP slowest are kept for /metrics
+    - `budget(n)` declares the most queries a view may issue; in TESTING
+      mode a request that goes over raises AssertionError
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.slowest = []
+        self.listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_SECONDS', 0.1)
+        app.config.setdefault('SLOW_QUERY_KEEP', 20)
+        app.config.setdefault('SERVER_TIMING', app.debug)
+        if not event.contains(Engine, 'after_cursor_execute', self._after_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', self.metrics)
+        app.extensions['query_stats'] = self
+
+    def budget(self, queries):
+        def decorator(view):
+            view.query_budget = queries
+            return view
+        return decorator
+
+    @contextmanager
+    def count_queries(self):
+        """Collects every statement run inside the block, in any context.
+
+            with stats.count_queries() as queries:
+                client.get('/venues')
+            assert len(queries) <= 1
+        """
+        queries = []
+        self.listeners.append(queries)
+        try:
+            yield queries
+        finally:
+            self.listeners.remove(queries)
+
+    def assert_max_queries(self, client, url, queries):
+        # test helper: fails when a GET of url runs more than `queries` statements
+        with self.count_queries() as seen:
+            response = client.get(url)
+            response.get_data()
+        if len(seen) > queries:
+            raise AssertionError('{} ran {} queries, budget is {}:\n{}'.format(
+                url, len(seen), queries, '\n'.join(statement for statement, _ in seen)))
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        for queries in self.listeners:
+            queries.append((statement, elapsed))
+        if has_request_context() and 'query_count' in g:
+            g.query_count += 1
+            g.query_seconds += elapsed
+        if not has_app_context():
+            return
+        if elapsed >= current_app.config['SLOW_QUERY_SECONDS']:
+            current_app.logger.warning('slow query (%.1f ms): %s', elapsed * 1000, statement,
+                extra={'db_ms': round(elapsed * 1000, 2)})
+            with self.lock:
+                entry = (elapsed, statement, request.endpoint if has_request_context() else None)
+                if len(self.slowest) < current_app.config['SLOW_QUERY_KEEP']:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heappushpop(self.slowest, entry)
+
+    def _before_request(self):
+        g.query_count = 0
+        g.query_seconds = 0.0
+        g.request_started = time.perf_counter()
+
+    def _after_request(self, response):
+        if 'query_count' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unknown'
+        with self.lock:
+            stats = self.requests.setdefault((endpoint, response.status_code), [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += g.query_count
+            stats[2] += g.query_seconds
+            stats[3] += elapsed
+        if current_app.config['SERVER_TIMING']:
+            response.headers.add('Server-Timing', 'db;dur={:.2f};desc="{} queries"'.format(
+                g.query_seconds * 1000, g.query_count))
+            response.headers.add('Server-Timing', 'app;dur={:.2f}'.format(elapsed * 1000))
+        budget = getattr(current_app.view_functions.get(endpoint), 'query_budget', None)
+        if budget is not None and g.query_count > budget and current_app.testing:
+            raise AssertionError('{} ran {} queries, budget is {}'.format(endpoint, g.query_count, budget))
+        return response
+
+    def metrics(self):
+        lines = []
+        with self.lock:
+            requests = sorted(self.requests.items())
+            slowest = sorted(self.slowest, reverse=True)
+        series = (
+            ('fyyur_requests_total', 'counter', 'Requests served.', 0),
+            ('fyyur_db_queries_total', 'counter', 'SQL statements executed while serving requests.', 1),
+            ('fyyur_db_seconds_total', 'counter', 'Time spent in SQL statements while serving requests.', 2),
+            ('fyyur_request_seconds_total', 'counter', 'Time spent serving requests.', 3),
+        )
+        for name, kind, help, index in series:
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for (endpoint, status), stats in requests:
+                lines.append('{}{{endpoint="{}",status="{}"}} {}'.format(name, endpoint, status, stats[index]))
+        lines.append('# HELP fyyur_slow_query_seconds Slowest statements seen by this process.')
+        lines.append('# TYPE fyyur_slow_query_seconds gauge')
+        for rank, (elapsed, statement, endpoint) in enumerate(slowest, 1):
+            lines.append('fyyur_slow_query_seconds{{rank="{}",endpoint="{}",statement="{}"}} {:.6f}'.format(
+                rank, endpoint or '', label_value(statement), elapsed))
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def label_value(statement):
+    statement = ' '.join(statement.split())[:200]
+    return statement.replace('\\', '\\\\').replace('"', '\\"')
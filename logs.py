@@ -0,0 +1,164 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import current_app, g, has_request_context, request
+from flask.logging import default_handler
+
+# attributes every LogRecord has; the rest came in through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message'}
+REQUEST_ID = re.compile(r'^[\w.-]{1,100}$')
+
+
+class StructuredLogging(object):
+    """JSON logs written off the request thread.
+
+    app.logger hands each record to a queue; a QueueListener thread formats
+    it as one JSON object per line and writes it to LOG_FILE, or to stderr
+    when LOG_FILE is unset, so a slow disk doesn't hold up responses.
+    Records logged while serving a request carry its request_id (the
+    client's X-Request-ID or a new one, echoed in the response), route,
+    method and path. Every request is logged as it finishes with its
+    status, latency_ms, db_ms and db_queries.
+
+    LOG_INFO_SAMPLE_RATE keeps that fraction of INFO and DEBUG records,
+    deciding once per request so a request's records are kept or dropped
+    together; warnings and errors are always written.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOG_FILE', None)
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault('LOG_INFO_SAMPLE_RATE', 1.0)
+        app.config.setdefault('LOG_REQUESTS', True)
+        if app.config['LOG_FILE']:
+            target = logging.FileHandler(app.config['LOG_FILE'])
+        else:
+            target = logging.StreamHandler(sys.stderr)
+        target.setFormatter(JSONFormatter())
+        records = queue.Queue(-1)
+        listener = QueueListener(records, target, respect_handler_level=True)
+        handler = RequestQueueHandler(records, listener)
+        handler.addFilter(RequestFilter(app.config['LOG_INFO_SAMPLE_RATE']))
+        listener.start()
+        # flushes what is still queued when the process exits
+        atexit.register(stop, listener)
+
+        # Flask names app.logger after the import name, so every app built
+        # in this process logs through the same logger; the newest app's
+        # handler replaces the one before it rather than writing alongside
+        for previous in [h for h in app.logger.handlers if isinstance(h, RequestQueueHandler)]:
+            app.logger.removeHandler(previous)
+            stop(previous.listener)
+        app.logger.removeHandler(default_handler)
+        app.logger.addHandler(handler)
+        app.logger.setLevel(app.config['LOG_LEVEL'])
+        # written once, by this handler, rather than again by the root's
+        app.logger.propagate = False
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.extensions['structured_logging'] = {'listener': listener}
+
+    def _before_request(self):
+        request_id = request.headers.get('X-Request-ID', '')
+        g.request_id = request_id if REQUEST_ID.match(request_id) else uuid.uuid4().hex
+        g.log_sampled = random.random() < current_app.config['LOG_INFO_SAMPLE_RATE']
+        g.log_started = time.perf_counter()
+
+    def _after_request(self, response):
+        if 'request_id' not in g:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+        if current_app.config['LOG_REQUESTS']:
+            # server errors are worth keeping whatever the sample rate
+            level = logging.WARNING if response.status_code >= 500 else logging.INFO
+            current_app.logger.log(level, '%s %s %s', request.method, request.path, response.status_code, extra={
+                'status': response.status_code,
+                'latency_ms': round((time.perf_counter() - g.log_started) * 1000, 2),
+                'db_ms': round(g.get('query_seconds', 0.0) * 1000, 2),
+                'db_queries': g.get('query_count', 0),
+            })
+        return response
+
+
+def stop(listener):
+    # QueueListener.stop fails if the listener was already stopped
+    if listener._thread is not None:
+        listener.stop()
+        for target in listener.handlers:
+            target.close()
+
+
+class RequestFilter(logging.Filter):
+    """Adds the current request's fields to a record and drops the INFO
+    and DEBUG records that aren't sampled."""
+
+    def __init__(self, sample_rate):
+        super(RequestFilter, self).__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        sampled = None
+        if has_request_context():
+            fields = record.__dict__
+            fields.setdefault('request_id', g.get('request_id'))
+            fields.setdefault('route', request.endpoint)
+            fields.setdefault('method', request.method)
+            fields.setdefault('path', request.path)
+            sampled = g.get('log_sampled')
+        if record.levelno > logging.INFO:
+            return True
+        if sampled is None:
+            sampled = random.random() < self.sample_rate
+        return sampled
+
+
+class RequestQueueHandler(QueueHandler):
+    """Renders the message and traceback on the thread that logs, while the
+    arguments and frames are still current, and queues the rest of the
+    record as is for JSONFormatter. `listener` is the QueueListener that
+    writes the queue out."""
+
+    def __init__(self, queue, listener):
+        super(RequestQueueHandler, self).__init__(queue)
+        self.listener = listener
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
@@ -0,0 +1,32 @@
+"""VenueDirectory table of per-area /venues snapshots
+
+Revision ID: 2f6b8d0a4c17
+Revises: 9c3f7b1e5a28
+Create Date: 2026-10-19 00:41:55.218304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6b8d0a4c17'
+down_revision = '9c3f7b1e5a28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # starts empty; `flask build-venue-directory` fills it, and until then
+    # each worker builds the directory in memory
+    op.create_table('VenueDirectory',
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('state', sa.String(length=2), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('city', 'state')
+    )
+
+
+def downgrade():
+    op.drop_table('VenueDirectory')
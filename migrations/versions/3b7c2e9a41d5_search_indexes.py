@@ -0,0 +1,70 @@
+"""search indexes on Venue and Artist
+
+Revision ID: 3b7c2e9a41d5
+Revises: f35d8a1dc106
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7c2e9a41d5'
+down_revision = 'f35d8a1dc106'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('name', 'city', 'state')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # trigram GIN indexes let ILIKE '%term%' and similarity() use an index
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in ('Venue', 'Artist'):
+            for column in SEARCH_COLUMNS:
+                op.create_index(
+                    'ix_{}_{}_trgm'.format(table.lower(), column), table, [column],
+                    postgresql_using='gin',
+                    postgresql_ops={column: 'gin_trgm_ops'}
+                )
+    elif dialect == 'sqlite':
+        # external-content FTS5 tables kept in sync with triggers
+        for table in ('Venue', 'Artist'):
+            fts = '{}_fts'.format(table.lower())
+            op.execute(
+                "CREATE VIRTUAL TABLE {fts} USING fts5(name, city, state, "
+                "content='{table}', content_rowid='id', tokenize='trigram')".format(fts=fts, table=table)
+            )
+            op.execute(
+                "CREATE TRIGGER {fts}_ai AFTER INSERT ON \"{table}\" BEGIN "
+                "INSERT INTO {fts}(rowid, name, city, state) VALUES (new.id, new.name, new.city, new.state); "
+                "END".format(fts=fts, table=table)
+            )
+            op.execute(
+                "CREATE TRIGGER {fts}_ad AFTER DELETE ON \"{table}\" BEGIN "
+                "INSERT INTO {fts}({fts}, rowid, name, city, state) VALUES ('delete', old.id, old.name, old.city, old.state); "
+                "END".format(fts=fts, table=table)
+            )
+            op.execute(
+                "CREATE TRIGGER {fts}_au AFTER UPDATE ON \"{table}\" BEGIN "
+                "INSERT INTO {fts}({fts}, rowid, name, city, state) VALUES ('delete', old.id, old.name, old.city, old.state); "
+                "INSERT INTO {fts}(rowid, name, city, state) VALUES (new.id, new.name, new.city, new.state); "
+                "END".format(fts=fts, table=table)
+            )
+            op.execute("INSERT INTO {fts}({fts}) VALUES ('rebuild')".format(fts=fts))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in ('Venue', 'Artist'):
+            for column in SEARCH_COLUMNS:
+                op.drop_index('ix_{}_{}_trgm'.format(table.lower(), column), table_name=table)
+    elif dialect == 'sqlite':
+        for table in ('Venue', 'Artist'):
+            fts = '{}_fts'.format(table.lower())
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS {}_{}'.format(fts, suffix))
+            op.execute('DROP TABLE IF EXISTS {}'.format(fts))
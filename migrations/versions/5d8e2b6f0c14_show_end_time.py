@@ -0,0 +1,73 @@
+"""end time on Show and overlap checks for venue and artist bookings
+
+Revision ID: 5d8e2b6f0c14
+Revises: 1a6d9e4c8b53
+Create Date: 2026-10-18 19:42:10.305617
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8e2b6f0c14'
+down_revision = '1a6d9e4c8b53'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+OVERLAPS = (
+    'SELECT EXISTS (SELECT 1 FROM "Show" a JOIN "Show" b ON a.id < b.id '
+    'AND a.{0} = b.{0} AND a.start_time < b.end_time AND b.start_time < a.end_time)'
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # existing shows get the default two hours
+    if dialect == 'postgresql':
+        op.execute('UPDATE "Show" SET end_time = start_time + interval \'2 hours\'')
+        op.alter_column('Show', 'end_time', nullable=False)
+    else:
+        # keep the fractional seconds suffix SQLAlchemy writes, so the text
+        # values still compare in time order
+        op.execute(
+            "UPDATE \"Show\" SET end_time = "
+            "strftime('%Y-%m-%d %H:%M:%S', start_time, '+2 hours') || substr(start_time, 20)"
+        )
+        # SQLite can't make an existing column NOT NULL without rebuilding
+        # the table; the model always supplies end_time
+
+    if dialect == 'postgresql':
+        # btree_gist lets a GiST index hold the plain integer id next to the range
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column in ('venue_id', 'artist_id'):
+            name = column.split('_')[0]
+            if not op.get_bind().execute(sa.text(OVERLAPS.format(column))).scalar():
+                # the database itself refuses double bookings
+                op.execute(
+                    'ALTER TABLE "Show" ADD CONSTRAINT ex_show_{0}_overlap EXCLUDE USING gist '
+                    '({1} WITH =, tsrange(start_time, end_time) WITH &&)'.format(name, column)
+                )
+            else:
+                logger.warning(
+                    'Show has overlapping %s bookings, so ex_show_%s_overlap was not created; '
+                    'list them with `flask check-schedule` and add the constraint once resolved',
+                    name, name)
+                op.execute(
+                    'CREATE INDEX ix_show_{0}_during ON "Show" USING gist '
+                    '({1}, tsrange(start_time, end_time))'.format(name, column)
+                )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for name in ('venue', 'artist'):
+            op.execute('ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS ex_show_{}_overlap'.format(name))
+            op.execute('DROP INDEX IF EXISTS ix_show_{}_during'.format(name))
+    op.drop_column('Show', 'end_time')
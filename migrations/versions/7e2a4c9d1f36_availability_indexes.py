@@ -0,0 +1,34 @@
+"""partial area indexes on seeking Venue and Artist rows
+
+Revision ID: 7e2a4c9d1f36
+Revises: 5d8e2b6f0c14
+Create Date: 2026-10-18 22:05:37.640129
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2a4c9d1f36'
+down_revision = '5d8e2b6f0c14'
+branch_labels = None
+depends_on = None
+
+# only the rows an availability search can return; the predicates match the
+# way SQLAlchemy renders the seeking flags on each dialect
+SEEKING = (('Venue', 'seeking_talent'), ('Artist', 'seeking_venue'))
+
+
+def upgrade():
+    for table, flag in SEEKING:
+        op.create_index(
+            'ix_{}_seeking_area'.format(table.lower()), table, ['state', sa.text('lower(city)')],
+            postgresql_where=sa.text(flag),
+            sqlite_where=sa.text('{} = 1'.format(flag))
+        )
+
+
+def downgrade():
+    for table, _ in SEEKING:
+        op.drop_index('ix_{}_seeking_area'.format(table.lower()), table_name=table)
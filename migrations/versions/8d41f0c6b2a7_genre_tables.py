@@ -0,0 +1,99 @@
+"""normalize genres into Genre and association tables
+
+Revision ID: 8d41f0c6b2a7
+Revises: 3b7c2e9a41d5
+Create Date: 2026-10-18 11:02:57.640312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f0c6b2a7'
+down_revision = '3b7c2e9a41d5'
+branch_labels = None
+depends_on = None
+
+
+def parse_genres(value):
+    # genres were stored as the string form of a list, e.g. '{Jazz,"Rock n Roll"}'
+    if not value:
+        return []
+    names = [name.strip().strip('"\'') for name in value.strip('{}[]').split(',')]
+    return [name for name in names if name]
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre_id')
+    )
+    op.create_index('ix_venue_genres_genre_id', 'venue_genres', ['genre_id', 'venue_id'])
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre_id')
+    )
+    op.create_index('ix_artist_genres_genre_id', 'artist_genres', ['genre_id', 'artist_id'])
+
+    # move the existing string data into the new tables
+    bind = op.get_bind()
+    venue = sa.table('Venue', sa.column('id', sa.Integer), sa.column('genres', sa.String))
+    artist = sa.table('Artist', sa.column('id', sa.Integer), sa.column('genres', sa.String))
+    venue_rows = [(row.id, parse_genres(row.genres)) for row in bind.execute(sa.select([venue.c.id, venue.c.genres]))]
+    artist_rows = [(row.id, parse_genres(row.genres)) for row in bind.execute(sa.select([artist.c.id, artist.c.genres]))]
+    names = sorted(set(name for _, genres in venue_rows + artist_rows for name in genres))
+    if names:
+        op.bulk_insert(genre, [{'name': name} for name in names])
+    genre_ids = dict((row.name, row.id) for row in bind.execute(sa.select([genre.c.id, genre.c.name])))
+    venue_genres = sa.table('venue_genres', sa.column('venue_id', sa.Integer), sa.column('genre_id', sa.Integer))
+    artist_genres = sa.table('artist_genres', sa.column('artist_id', sa.Integer), sa.column('genre_id', sa.Integer))
+    links = [{'venue_id': venue_id, 'genre_id': genre_ids[name]}
+             for venue_id, genres in venue_rows for name in set(genres)]
+    if links:
+        op.bulk_insert(venue_genres, links)
+    links = [{'artist_id': artist_id, 'genre_id': genre_ids[name]}
+             for artist_id, genres in artist_rows for name in set(genres)]
+    if links:
+        op.bulk_insert(artist_genres, links)
+
+    op.drop_column('Venue', 'genres')
+    op.drop_column('Artist', 'genres')
+
+
+def downgrade():
+    op.add_column('Artist', sa.Column('genres', sa.String(), nullable=True))
+    op.add_column('Venue', sa.Column('genres', sa.String(), nullable=True))
+
+    bind = op.get_bind()
+    for table, key, links in (('Venue', 'venue_id', 'venue_genres'), ('Artist', 'artist_id', 'artist_genres')):
+        rows = bind.execute(sa.text(
+            'SELECT l.{key}, g.name FROM {links} l JOIN "Genre" g ON g.id = l.genre_id '
+            'ORDER BY l.{key}, g.name'.format(key=key, links=links)
+        ))
+        genres = {}
+        for entity_id, name in rows:
+            genres.setdefault(entity_id, []).append(name)
+        for entity_id, names in genres.items():
+            bind.execute(
+                sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(table)),
+                genres='{' + ','.join(names) + '}', id=entity_id
+            )
+
+    op.drop_index('ix_artist_genres_genre_id', table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_index('ix_venue_genres_genre_id', table_name='venue_genres')
+    op.drop_table('venue_genres')
+    op.drop_table('Genre')
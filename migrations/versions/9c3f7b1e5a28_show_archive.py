@@ -0,0 +1,46 @@
+"""ShowArchive table for shows past the archive horizon
+
+Revision ID: 9c3f7b1e5a28
+Revises: 7e2a4c9d1f36
+Create Date: 2026-10-18 23:48:12.507316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3f7b1e5a28'
+down_revision = '7e2a4c9d1f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Postgres partitions by start_time; `flask archive-shows` adds a
+    # partition per year as it moves rows in
+    op.create_table('ShowArchive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'start_time'),
+    postgresql_partition_by='RANGE (start_time)'
+    )
+    op.create_index('ix_show_archive_venue_id_start_time', 'ShowArchive', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_archive_artist_id_start_time', 'ShowArchive', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    # archived shows go back to Show first, so downgrading loses no history
+    op.execute(
+        'INSERT INTO "Show" (id, artist_id, venue_id, start_time, end_time) '
+        'SELECT id, artist_id, venue_id, start_time, end_time FROM "ShowArchive"'
+    )
+    op.drop_index('ix_show_archive_artist_id_start_time', table_name='ShowArchive')
+    op.drop_index('ix_show_archive_venue_id_start_time', table_name='ShowArchive')
+    # on Postgres this drops the yearly partitions with it
+    op.drop_table('ShowArchive')
@@ -0,0 +1,39 @@
+"""upcoming and past show counters on Venue and Artist
+
+Revision ID: e9f3a5b17c42
+Revises: c52e1d7f9a30
+Create Date: 2026-10-18 15:40:19.305871
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9f3a5b17c42'
+down_revision = 'c52e1d7f9a30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill from the existing shows; `flask refresh-show-counts` keeps them current
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.get_bind().execute(sa.text(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time > :now), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time <= :now)'
+            .format(table=table, key=key)
+        ), now=datetime.now())
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,172 @@
+from datetime import timedelta
+
+from sqlalchemy import DDL, event
+
+from extensions import db
+
+venue_genres = db.Table('venue_genres',
+  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+  db.Index('ix_venue_genres_genre_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table('artist_genres',
+  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+  db.Index('ix_artist_genres_genre_id', 'genre_id', 'artist_id')
+)
+
+class Genre(db.Model):
+  __tablename__ = 'Genre'
+
+  id = db.Column(db.Integer, primary_key=True)
+  name = db.Column(db.String(120), nullable=False, unique=True)
+
+# Availability searches read only seeking rows of one area; the same partial
+# (state, lower(city)) indexes as migration 7e2a4c9d1f36, with predicates
+# matching the way SQLAlchemy renders the seeking flags on each dialect.
+def seeking_area_index(table, flag):
+  return db.Index('ix_{}_seeking_area'.format(table.lower()), 'state', db.text('lower(city)'),
+    postgresql_where=db.text(flag), sqlite_where=db.text('{} = 1'.format(flag)))
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+      seeking_area_index('Venue', 'seeking_talent'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(2), nullable=False)
+    address = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    website = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(500))
+    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name')
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows = db.relationship('Show', backref='venue', passive_deletes='all', lazy=True)
+    archived_shows = db.relationship('ShowArchive', backref='venue', passive_deletes='all',
+      lazy=True, order_by='ShowArchive.start_time')
+    # bumped by the ORM on every update; feeds the API ETags
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+      seeking_area_index('Artist', 'seeking_venue'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(2), nullable=False)
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    website = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name')
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows = db.relationship('Show', backref='artist', passive_deletes='all', lazy=True)
+    archived_shows = db.relationship('ShowArchive', backref='artist', passive_deletes='all',
+      lazy=True, order_by='ShowArchive.start_time')
+    # bumped by the ORM on every update; feeds the API ETags
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+# Search on SQLite reads the FTS5 trigram tables created by migration
+# 3b7c2e9a41d5. The same DDL runs when db.create_all() builds the schema
+# instead, as for tests, so text_search() finds them there too.
+def add_search_table(model):
+  fts = '{}_fts'.format(model.__tablename__.lower())
+  statements = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(name, city, state, "
+    "content='{table}', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON \"{table}\" BEGIN "
+    "INSERT INTO {fts}(rowid, name, city, state) VALUES (new.id, new.name, new.city, new.state); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON \"{table}\" BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, name, city, state) VALUES ('delete', old.id, old.name, old.city, old.state); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON \"{table}\" BEGIN "
+    "INSERT INTO {fts}({fts}, rowid, name, city, state) VALUES ('delete', old.id, old.name, old.city, old.state); "
+    "INSERT INTO {fts}(rowid, name, city, state) VALUES (new.id, new.name, new.city, new.state); "
+    "END",
+  ]
+  for statement in statements:
+    event.listen(model.__table__, 'after_create',
+      DDL(statement.format(fts=fts, table=model.__tablename__)).execute_if(dialect='sqlite'))
+  # the triggers go with the table, the FTS table has to be dropped
+  event.listen(model.__table__, 'before_drop',
+    DDL('DROP TABLE IF EXISTS {}'.format(fts)).execute_if(dialect='sqlite'))
+
+add_search_table(Venue)
+add_search_table(Artist)
+
+class Show(db.Model):
+  __tablename__= 'Show'
+  __table_args__ = (
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_show_start_time', 'start_time'),
+  )
+
+  # a booking occupies [start_time, end_time). Capping the length bounds how
+  # far back a conflict check has to look on the (id, start_time) indexes
+  DEFAULT_DURATION = timedelta(hours=2)
+  MAX_DURATION = timedelta(hours=12)
+
+  id = db.Column(db.Integer, primary_key=True)
+  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
+  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
+  start_time = db.Column(db.DateTime, nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False,
+    default=lambda context: context.get_current_parameters()['start_time'] + Show.DEFAULT_DURATION)
+
+  @property
+  def duration(self):
+    # minutes, as the show form and bulk files take it
+    return int((self.end_time - self.start_time).total_seconds() // 60)
+
+class ShowArchive(db.Model):
+  # Shows that ended before the archive horizon, moved out of Show by
+  # `flask archive-shows` so the upcoming-show indexes stay small. Rows keep
+  # their Show id. Only views of past shows read this table; bookings,
+  # conflict checks, availability and the shows feed use Show alone. On
+  # Postgres it is range-partitioned by start_time, one partition a year.
+  __tablename__ = 'ShowArchive'
+  __table_args__ = (
+    db.Index('ix_show_archive_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_archive_artist_id_start_time', 'artist_id', 'start_time'),
+    {'postgresql_partition_by': 'RANGE (start_time)'}
+  )
+
+  # a partitioned table's primary key must include the partition key
+  id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  start_time = db.Column(db.DateTime, primary_key=True)
+  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
+  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False)
+
+  @property
+  def duration(self):
+    return int((self.end_time - self.start_time).total_seconds() // 60)
+
+class VenueDirectory(db.Model):
+  # The /venues listing of one area as a compact blob, see directory.py.
+  # Rewritten in the transaction that changes one of its venues or their
+  # upcoming show counts.
+  __tablename__ = 'VenueDirectory'
+
+  city = db.Column(db.String(120), primary_key=True)
+  state = db.Column(db.String(2), primary_key=True)
+  data = db.Column(db.LargeBinary, nullable=False)
+  built_at = db.Column(db.DateTime, nullable=False)
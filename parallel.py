@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_request_context
+from sqlalchemy.engine.url import make_url
+
+
+class ParallelQueries(object):
+    """Runs the independent reads of a request at the same time.
+
+    `gather(a, b, c)` executes each query (an ORM Query or a Core select)
+    on its own pooled connection from a per-process thread pool and returns
+    their rows in order, so a view waits for its slowest query rather than
+    for the sum of them. The rows are plain result rows, not ORM objects.
+
+    Only for read_only views: the queries use connections of their own to
+    the request's replica or primary and don't see the session's
+    uncommitted changes. The PARALLEL_QUERY_WORKERS threads are shared by
+    every request of the process. They check out their connections from a
+    pool of their own, one connection a thread, rather than from the
+    session's: a request thread waits on them while holding a session
+    connection, so sharing a pool would let busy request threads take
+    every connection and leave the queries they wait for none. With 0
+    workers, or on an in-memory SQLite database whose data a second
+    connection wouldn't see, the queries run one after another on the
+    request's session. Statements still count towards the view's query
+    budget.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PARALLEL_QUERY_WORKERS', 8)
+        # the pool is started on first use, so gunicorn's preload doesn't
+        # fork a process that has threads
+        app.extensions['parallel_queries'] = {'executor': None, 'engines': {}}
+
+    def gather(self, *queries):
+        statements = [getattr(query, 'statement', query) for query in queries]
+        app = current_app._get_current_object()
+        db = app.extensions['sqlalchemy'].db
+        bind = g.get('db_replica')
+        executor = self._executor(app)
+        database = db.get_engine(app, bind=bind).url.database
+        if executor is None or len(statements) < 2 or database in (None, '', ':memory:'):
+            return [db.session.execute(statement).fetchall() for statement in statements]
+        engine = self._engine(app, db, bind)
+        futures = [executor.submit(self._run, app, engine, statement) for statement in statements]
+        results = [future.result() for future in futures]
+        if has_request_context() and 'query_count' in g:
+            # the statements ran outside the request context, so QueryStats
+            # didn't see them
+            g.query_count += len(results)
+            g.query_seconds += sum(elapsed for _, elapsed in results)
+        return [rows for rows, _ in results]
+
+    def _executor(self, app):
+        state = app.extensions['parallel_queries']
+        workers = app.config['PARALLEL_QUERY_WORKERS']
+        if workers < 1:
+            return None
+        if state['executor'] is None:
+            with self.lock:
+                if state['executor'] is None:
+                    state['executor'] = ThreadPoolExecutor(workers, thread_name_prefix='parallel-query')
+        return state['executor']
+
+    def _engine(self, app, db, bind):
+        # the bind's settings, with a pool as large as the thread pool
+        engines = app.extensions['parallel_queries']['engines']
+        if bind not in engines:
+            with self.lock:
+                if bind not in engines:
+                    connector = db.make_connector(app, bind)
+                    url, options = connector.get_options(make_url(connector.get_uri()), app.config['SQLALCHEMY_ECHO'])
+                    options.update(pool_size=app.config['PARALLEL_QUERY_WORKERS'], max_overflow=0)
+                    engines[bind] = db.create_engine(url, options)
+        return engines[bind]
+
+    def _run(self, app, engine, statement):
+        # an app context so QueryStats still logs slow statements
+        with app.app_context():
+            started = time.perf_counter()
+            with engine.connect() as connection:
+                rows = connection.execute(statement).fetchall()
+            return rows, time.perf_counter() - started
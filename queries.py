@@ -0,0 +1,205 @@
+import json
+import base64
+from datetime import datetime
+
+from flask import abort, current_app
+from sqlalchemy import and_, or_, case, true, tuple_, table, column, literal, literal_column, select, union_all
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import Venue, Artist, Show, ShowArchive, Genre, venue_genres, artist_genres
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(*values):
+  # opaque, url-safe token holding the sort key of the last row on a page
+  values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+  return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, *types):
+  # types converts each stored value back, e.g. (datetime.fromisoformat, int)
+  try:
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if len(values) != len(types):
+      abort(400)
+    return [convert(value) for convert, value in zip(types, values)]
+  except (ValueError, TypeError):
+    abort(400)
+
+def keyset_page(query, columns, after=None):
+  return split_page(keyset_query(query, columns, after).all())
+
+def keyset_query(query, columns, after=None):
+  # seek past the (columns) tuple of the last row seen instead of using OFFSET,
+  # so every page costs the same no matter how deep it is; the query asks for
+  # one row more than a page, which split_page() uses to tell if there's a next
+  page_size = current_app.config['PAGE_SIZE']
+  if after:
+    query = query.filter(tuple_(*columns) > tuple_(*after))
+  return query.order_by(*columns).limit(page_size + 1)
+
+def split_page(rows):
+  page_size = current_app.config['PAGE_SIZE']
+  return rows[:page_size], len(rows) > page_size
+
+def count_query(query):
+  # what query.count() runs, as a query that parallel.gather can run
+  return query.from_self(db.func.count(literal_column('*')))
+
+#----------------------------------------------------------------------------#
+# Counters and genres.
+#----------------------------------------------------------------------------#
+
+# A show is upcoming while start_time > now and past from the moment it
+# starts. The counters, the detail pages and their fingerprints all split
+# shows this way, so they agree on one that starts exactly at now.
+
+def count_new_show(venue_id, artist_id, start_time, now):
+  # bumps the counters of a new show's venue and artist in the same transaction
+  column = 'upcoming_shows_count' if start_time > now else 'past_shows_count'
+  for model, entity_id in ((Venue, venue_id), (Artist, artist_id)):
+    counter = getattr(model, column)
+    model.query.filter(model.id == entity_id).update(
+      {counter: counter + 1}, synchronize_session=False)
+
+def refresh_show_counts(now, venue_ids=None, artist_ids=None):
+  # Recomputes the counters from Show and ShowArchive for the given ids
+  # (None means every row). Idempotent, so it is safe to run on
+  # overlapping windows.
+  for model, key, ids in ((Venue, 'venue_id', venue_ids), (Artist, 'artist_id', artist_ids)):
+    if ids is not None and not ids:
+      continue
+    column, archived = getattr(Show, key), getattr(ShowArchive, key)
+    upcoming = db.session.query(db.func.count(Show.id)).filter(
+      column == model.id, Show.start_time > now).correlate(model).as_scalar()
+    past = db.session.query(db.func.count(Show.id)).filter(
+      column == model.id, Show.start_time <= now).correlate(model).as_scalar()
+    # archived shows are all past
+    past = past + db.session.query(db.func.count(ShowArchive.id)).filter(
+      archived == model.id).correlate(model).as_scalar()
+    query = model.query
+    if ids is not None:
+      query = query.filter(model.id.in_(ids))
+    query.update({
+      model.upcoming_shows_count: upcoming,
+      model.past_shows_count: past
+    }, synchronize_session=False)
+
+def genres_by_name(names):
+  # Genre rows for the submitted names, creating any that don't exist yet
+  genres = Genre.query.filter(Genre.name.in_(names)).all() if names else []
+  known = set(genre.name for genre in genres)
+  for name in names:
+    if name not in known:
+      known.add(name)
+      genres.append(Genre(name=name))
+  return genres
+
+def genre_filter(model, names):
+  # restricts to rows tagged with every requested genre; each test is an
+  # EXISTS probe on the (genre_id, entity_id) association index
+  return and_(true(), *[model.genres.any(Genre.name == name) for name in names])
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+def detail_queries(model, entity_id, now):
+  # The reads behind a venue or artist page, none depending on another, for
+  # parallel.gather: the row itself, its genre names, its upcoming shows and
+  # its past shows, archived ones included. Shows come in (start_time, id)
+  # order with the id, name and image of the other side as other_id,
+  # other_name and other_image_link.
+  other = Artist if model is Venue else Venue
+  key, other_key = ('venue_id', 'artist_id') if model is Venue else ('artist_id', 'venue_id')
+  links = venue_genres if model is Venue else artist_genres
+
+  def shows(source):
+    return db.session.query(
+      source.id,
+      source.start_time,
+      source.end_time,
+      other.id.label('other_id'),
+      other.name.label('other_name'),
+      other.image_link.label('other_image_link')
+    ).join(other, other.id == getattr(source, other_key)).filter(getattr(source, key) == entity_id)
+
+  entity = db.session.query(model).filter(model.id == entity_id)
+  genres = db.session.query(Genre.name).join(links, links.c.genre_id == Genre.id).filter(
+    links.c[key] == entity_id).order_by(Genre.name)
+  upcoming = shows(Show).filter(Show.start_time > now).order_by(Show.start_time, Show.id)
+  past = union_all(
+    shows(Show).filter(Show.start_time <= now).statement,
+    shows(ShowArchive).statement
+  ).alias()
+  past = select([past]).order_by(past.c.start_time, past.c.id)
+  return entity, genres, upcoming, past
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+def detail_fingerprint(model, entity_id, now):
+  # What a venue or artist page renders, in one aggregate: the row's
+  # version, its shows, the versions of the other side of those shows and
+  # how many of them are past. None if there is no such row.
+  other = Artist if model is Venue else Venue
+  key, other_key = ('venue_id', 'artist_id') if model is Venue else ('artist_id', 'venue_id')
+  column, other_column = getattr(Show, key), getattr(Show, other_key)
+  # archived shows are all past, so their number and the versions of the
+  # names shown from them are enough
+  archived_other = aliased(other)
+  archived = db.session.query(ShowArchive).join(
+    archived_other, archived_other.id == getattr(ShowArchive, other_key)
+  ).filter(getattr(ShowArchive, key) == model.id).correlate(model)
+  row = db.session.query(
+    model.version,
+    db.func.count(Show.id),
+    db.func.max(Show.id),
+    db.func.sum(other.version),
+    db.func.sum(case([(Show.start_time <= now, 1)], else_=0)),
+    archived.with_entities(db.func.count(ShowArchive.id)).as_scalar(),
+    archived.with_entities(db.func.sum(archived_other.version)).as_scalar()
+  ).outerjoin(Show, column == model.id
+  ).outerjoin(other, other.id == other_column
+  ).filter(model.id == entity_id).group_by(model.version).first()
+  return list(row) if row is not None else None
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def text_search(query, model, search_term):
+  # Filters query to rows of model whose name, city or state contain
+  # search_term and returns it with a relevance score (higher is better).
+  # Postgres relies on the pg_trgm GIN indexes and SQLite on the FTS5
+  # trigram tables of migration 3b7c2e9a41d5 (or db.create_all(), see models.py).
+  pattern = '%{}%'.format(search_term)
+  criteria = or_(
+    model.name.ilike(pattern),
+    model.city.ilike(pattern),
+    model.state.ilike(pattern)
+  )
+  if len(search_term) < 3:
+    # too short to form a trigram, so no index can help here
+    return query.filter(criteria), literal(0.0)
+  dialect = db.engine.dialect.name
+  if dialect == 'postgresql':
+    rank = db.func.greatest(
+      db.func.similarity(model.name, search_term),
+      db.func.similarity(model.city, search_term),
+      db.func.similarity(model.state, search_term)
+    )
+    return query.filter(criteria), rank
+  if dialect == 'sqlite':
+    fts = table('{}_fts'.format(model.__tablename__.lower()), column('rowid'), column('rank'))
+    matches = db.session.query(
+      fts.c.rowid.label('id'),
+      (-fts.c.rank).label('rank')
+    ).filter(
+      literal_column(fts.name).op('MATCH')('"{}"'.format(search_term.replace('"', '""')))
+    ).subquery()
+    return query.join(matches, matches.c.id == model.id), matches.c.rank
+  return query.filter(criteria), literal(0.0)
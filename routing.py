@@ -0,0 +1,77 @@
+import random
+import time
+
+from flask import current_app, g, has_app_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+
+# QueuePool settings; SQLite engines use NullPool or StaticPool instead
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+class RoutingSession(SignallingSession):
+    """Sends the reads of a request picked for a replica to that replica;
+    flushes, and every other request, use the primary."""
+
+    def __init__(self, db, **options):
+        self.db = db
+        super(RoutingSession, self).__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get('db_replica') if has_app_context() else None
+        if replica is not None and not self._flushing:
+            return self.db.get_engine(self.app, bind=replica)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with read replicas.
+
+    SQLALCHEMY_REPLICA_URIS lists the replicas; they become the binds
+    replica0, replica1, ... and share SQLALCHEMY_ENGINE_OPTIONS with the
+    primary. Views marked with `read_only` run against one replica chosen
+    at random per request. After a request that may have written (anything
+    but GET/HEAD/OPTIONS outside a read_only view) the client is pinned to
+    the primary for REPLICA_STICKY_SECONDS, so it reads its own writes
+    while the replicas catch up.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 10)
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for number, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+            binds['replica{}'.format(number)] = uri
+        app.config['SQLALCHEMY_BINDS'] = binds or None
+        super(RoutingSQLAlchemy, self).init_app(app)
+        if app.config['SQLALCHEMY_REPLICA_URIS']:
+            app.before_request(self._choose_bind)
+            app.after_request(self._stick_to_primary)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        if sa_url.drivername.startswith('sqlite'):
+            for option in QUEUE_POOL_OPTIONS:
+                engine_opts.pop(option, None)
+        return super(RoutingSQLAlchemy, self).create_engine(sa_url, engine_opts)
+
+    def read_only(self, view):
+        view.read_only = True
+        return view
+
+    def _is_read_only(self):
+        view = current_app.view_functions.get(request.endpoint)
+        return getattr(view, 'read_only', False)
+
+    def _choose_bind(self):
+        if self._is_read_only() and session.get('db_primary_until', 0) < time.time():
+            replicas = len(current_app.config['SQLALCHEMY_REPLICA_URIS'])
+            g.db_replica = 'replica{}'.format(random.randrange(replicas))
+
+    def _stick_to_primary(self, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and not self._is_read_only():
+            session['db_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        return response
+
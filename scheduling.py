@@ -0,0 +1,243 @@
+import heapq
+import itertools
+import re
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import and_, or_
+
+from extensions import db
+from models import Venue, Show
+from queries import genre_filter
+
+
+class IntervalTree(object):
+    """Static interval tree over half-open [start, end) intervals.
+
+    Built once in O(n log n); `overlapping(start, end)` returns the payloads
+    of the intervals overlapping [start, end) in O(log n + k). The intervals
+    sit in an array sorted by start: the middle of every slice is the root
+    of that slice's subtree, and max_end holds the latest end below it.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda interval: interval[0])
+        self.max_end = [None] * len(self.intervals)
+        self._build(0, len(self.intervals))
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        end = self.intervals[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > end:
+                end = child
+        self.max_end[mid] = end
+        return end
+
+    def overlapping(self, start, end):
+        found = []
+        slices = [(0, len(self.intervals))]
+        while slices:
+            lo, hi = slices.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] <= start:
+                # everything in this subtree is over before start
+                continue
+            slices.append((lo, mid))
+            interval_start, interval_end, payload = self.intervals[mid]
+            if interval_start < end:
+                if interval_end > start:
+                    found.append(payload)
+                slices.append((mid + 1, hi))
+        return found
+
+
+# most shows one recurring booking may create, about a year of nightly shows
+MAX_OCCURRENCES = 366
+
+
+def occurrences(start_time, repeat=None, interval=1, count=None, until=None, rule=None, dates=None):
+    """Start times of a recurring booking, sorted and without duplicates.
+
+    repeat is None for a single show, 'weekly' or 'monthly' (every
+    `interval` weeks or months, `count` times or until the day `until`),
+    'rrule' for an iCalendar RRULE string (see local_rule) or 'dates' for text listing one
+    date per line or separated by ';'. Raises ValueError with a message
+    for the user.
+    """
+    from dateutil import parser, rrule as rrules
+    if not repeat:
+        return [start_time]
+    if repeat in ('weekly', 'monthly'):
+        if not count and not until:
+            raise ValueError('Give a number of shows or a last date.')
+        found = rrules.rrule(
+            rrules.WEEKLY if repeat == 'weekly' else rrules.MONTHLY,
+            dtstart=start_time, interval=interval or 1,
+            until=datetime.combine(until, time.max) if until else None)
+        if count:
+            # dateutil deprecates giving an rrule both count and until
+            found = itertools.islice(found, count)
+    elif repeat == 'rrule':
+        try:
+            found = rrules.rrulestr(local_rule(rule), dtstart=start_time)
+        except (ValueError, TypeError) as e:
+            raise ValueError('Not a valid RRULE: {}'.format(e))
+    elif repeat == 'dates':
+        found = []
+        for line in (dates or '').replace(';', '\n').splitlines():
+            if line.strip():
+                try:
+                    # missing parts, such as the time, come from start_time
+                    found.append(parser.parse(line, default=start_time))
+                except (ValueError, OverflowError):
+                    raise ValueError('Not a date: {}'.format(line.strip()))
+    else:
+        raise ValueError('Unknown repeat {!r}'.format(repeat))
+    # an RRULE without COUNT or UNTIL never ends
+    found = sorted(set(itertools.islice(found, MAX_OCCURRENCES + 1)))
+    if len(found) > MAX_OCCURRENCES:
+        raise ValueError('A booking can create at most {} shows.'.format(MAX_OCCURRENCES))
+    if not found:
+        raise ValueError('The schedule has no dates.')
+    return found
+
+
+def local_rule(rule):
+    """An RRULE as pasted from a calendar, made to run from the form's start
+    time: DTSTART lines are dropped, and UTC times such as UNTIL=...Z are
+    read as local times, like the naive start_time."""
+    # dateutil splits the lines on any whitespace, so the one-line form
+    # field can hold several
+    lines = [line for line in (rule or '').split() if not line.upper().startswith('DTSTART')]
+    return re.sub(r'(\d{8}T\d{6})Z\b', r'\1', '\n'.join(lines), flags=re.IGNORECASE)
+
+
+def end_time_for(start_time, minutes=None):
+    return start_time + (timedelta(minutes=minutes) if minutes else Show.DEFAULT_DURATION)
+
+
+def overlaps(start_time, end_time):
+    """Filter for shows overlapping [start_time, end_time)."""
+    if db.engine.dialect.name == 'postgresql':
+        # served by the GiST (id, tsrange) index or exclusion constraint
+        return db.func.tsrange(Show.start_time, Show.end_time).op('&&')(
+            db.func.tsrange(start_time, end_time))
+    # a range on the (id, start_time) btree indexes: no show can reach into
+    # the window from further back than MAX_DURATION
+    return and_(
+        Show.start_time < end_time,
+        Show.start_time > start_time - Show.MAX_DURATION,
+        Show.end_time > start_time
+    )
+
+
+def available(model, state, city, genres, start_time, end_time):
+    """Query for the venues or artists (model) of an area that are seeking
+    bookings and have no show overlapping [start_time, end_time).
+
+    One statement: the area and seeking flag come from the partial
+    (state, lower(city)) index of migration 7e2a4c9d1f36, and each candidate
+    is ruled out by a NOT EXISTS probe on its (id, start_time) Show index.
+    """
+    seeking = model.seeking_talent if model is Venue else model.seeking_venue
+    shows = Show.venue_id if model is Venue else Show.artist_id
+    booked = db.session.query(Show.id).filter(
+        shows == model.id, overlaps(start_time, end_time)).correlate(model)
+    query = db.session.query(model.id, model.name, model.city, model.state).filter(
+        seeking,
+        model.state == state,
+        genre_filter(model, genres),
+        ~booked.exists()
+    )
+    if city:
+        query = query.filter(db.func.lower(model.city) == city.lower())
+    return query
+
+
+def describe(show):
+    return 'show {} ({:%Y-%m-%d %H:%M}-{:%H:%M}) at venue {} with artist {}'.format(
+        show.id, show.start_time, show.end_time, show.venue_id, show.artist_id)
+
+
+def schedule_conflicts(rows):
+    """Checks a batch of new shows against the database and each other.
+
+    rows are dicts with venue_id, artist_id, start_time and end_time.
+    Returns {index in rows: [message, ...]} for the rows that clash. The
+    bookings the batch could touch are read in one query and indexed in
+    memory, one interval tree per venue and per artist.
+    """
+    if not rows:
+        return {}
+    earliest = min(row['start_time'] for row in rows)
+    latest = max(row['end_time'] for row in rows)
+    venue_ids = set(row['venue_id'] for row in rows)
+    artist_ids = set(row['artist_id'] for row in rows)
+    booked = Show.query.filter(
+        or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)),
+        overlaps(earliest, latest)
+    ).all()
+
+    trees = {}
+    for key in ('venue_id', 'artist_id'):
+        intervals = {}
+        for show in booked:
+            intervals.setdefault(getattr(show, key), []).append((show.start_time, show.end_time, show))
+        trees[key] = dict((value, IntervalTree(found)) for value, found in intervals.items())
+
+    conflicts = {}
+    for index, row in enumerate(rows):
+        for key in ('venue_id', 'artist_id'):
+            tree = trees[key].get(row[key])
+            if tree is None:
+                continue
+            for show in tree.overlapping(row['start_time'], row['end_time']):
+                message = 'Overlaps ' + describe(show) + '.'
+                # a show sharing both venue and artist turns up in both trees
+                if message not in conflicts.get(index, ()):
+                    conflicts.setdefault(index, []).append(message)
+    for key, first, second in overlapping_pairs(rows):
+        label = 'venue' if key == 'venue_id' else 'artist'
+        conflicts.setdefault(second, []).append(
+            'Overlaps row {} of this batch at the same {}.'.format(first + 1, label))
+    return conflicts
+
+
+def overlapping_pairs(rows):
+    """(key, i, j) for every pair of rows, i < j, that share a venue or an
+    artist and overlap in time. A sweep over each group sorted by start."""
+    for key in ('venue_id', 'artist_id'):
+        groups = {}
+        for index, row in enumerate(rows):
+            groups.setdefault(row[key], []).append((row['start_time'], row['end_time'], index))
+        for group in groups.values():
+            group.sort()
+            active = []
+            for start, end, index in group:
+                while active and active[0][0] <= start:
+                    heapq.heappop(active)
+                for _, other in sorted(active, key=lambda item: item[1]):
+                    yield key, min(other, index), max(other, index)
+                heapq.heappush(active, (end, index))
+
+
+def existing_conflicts(chunk=10000):
+    """(key, show, show) for every overlapping pair already in the table,
+    read in (key, start_time) order so memory stays per venue or artist."""
+    for key in ('venue_id', 'artist_id'):
+        column = getattr(Show, key)
+        current, active = None, []
+        rows = db.session.query(
+            Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time
+        ).order_by(column, Show.start_time, Show.id).yield_per(chunk)
+        for show in rows:
+            if getattr(show, key) != current:
+                current, active = getattr(show, key), []
+            active = [other for other in active if other.end_time > show.start_time]
+            for other in active:
+                yield key, other, show
+            active.append(show)
@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import Blueprint, current_app, render_template, request, flash
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
+
+import directory
+from extensions import db, cache, query_stats
+from formatting import format_datetimes
+from forms import ShowForm
+from models import Show, ShowArchive
+from queries import decode_cursor, encode_cursor, keyset_page, count_new_show, refresh_show_counts
+from scheduling import occurrences, end_time_for, schedule_conflicts
+
+# cli_group=None keeps `flask refresh-show-counts` top level
+bp = Blueprint('shows', __name__, cli_group=None)
+
+@bp.route('/shows')
+@db.read_only
+@query_stats.budget(1)
+@cache.cached
+def shows():
+  # reads Show alone: shows moved to ShowArchive by `flask archive-shows`
+  # are listed only on their venue and artist pages
+  after = request.args.get('after')
+  if after:
+    after = decode_cursor(after, datetime.fromisoformat, int)
+  query = Show.query.options(joinedload(Show.venue), joinedload(Show.artist))
+  shows, has_more = keyset_page(query, [Show.start_time, Show.id], after)
+  cache.tag('shows')
+  data = []
+  start_times = format_datetimes([show.start_time for show in shows], 'full')
+  for show, start_time in zip(shows, start_times):
+    entry = {
+      'id': show.id,
+      'venue_id': show.venue_id,
+      'venue_name': show.venue.name,
+      'venue_version': show.venue.version,
+      'artist_id': show.artist_id,
+      'artist_name': show.artist.name,
+      'artist_image_link': show.artist.image_link,
+      'artist_version': show.artist.version,
+      'start_time': start_time
+    }
+    data.append(entry)
+    cache.tag('venue:{}'.format(show.venue_id), 'artist:{}'.format(show.artist_id))
+  next_cursor = encode_cursor(shows[-1].start_time, shows[-1].id) if has_more else None
+
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor)
+
+@bp.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  form = ShowForm(request.form, meta={"csrf": False})
+  if form.validate_on_submit():
+    current_app.logger.debug('show form validated')
+    try:
+      start_times = occurrences(form.start_time.data, form.repeat.data, form.interval.data,
+        form.count.data, form.until.data, form.rrule.data, form.dates.data)
+    except ValueError as e:
+      flash(str(e), category='error')
+      return render_template('forms/new_show.html', form=form)
+    venue_id, artist_id = int(form.venue_id.data), int(form.artist_id.data)
+    rows = [{
+      'venue_id': venue_id,
+      'artist_id': artist_id,
+      'start_time': start_time,
+      'end_time': end_time_for(start_time, form.duration.data)
+    } for start_time in start_times]
+    # every occurrence is checked against the bookings in one query
+    conflicts = schedule_conflicts(rows)
+    if conflicts:
+      messages = ['{:%Y-%m-%d %H:%M}: {}'.format(rows[index]['start_time'], ' '.join(found))
+        for index, found in sorted(conflicts.items())]
+      if len(messages) > 5:
+        messages[5:] = ['and {} more'.format(len(messages) - 5)]
+      flash('The venue or artist is already booked at that time. ' + ' '.join(messages), category='error')
+      return render_template('forms/new_show.html', form=form)
+    try:
+      if len(rows) == 1:
+        db.session.add(Show(**rows[0]))
+        count_new_show(venue_id, artist_id, rows[0]['start_time'], datetime.now())
+      else:
+        # one executemany and one recount, all in the same transaction
+        db.session.execute(Show.__table__.insert(), rows)
+        refresh_show_counts(datetime.now(), venue_ids=[venue_id], artist_ids=[artist_id])
+      directory.refresh(venue_ids=[venue_id])
+      db.session.commit()
+      cache.invalidate('shows', 'venue:{}'.format(venue_id), 'artist:{}'.format(artist_id))
+      flash('Show successfully listed!' if len(rows) == 1 else '{} shows successfully listed!'.format(len(rows)))
+    except SQLAlchemyError:
+      db.session.rollback()
+      current_app.logger.exception('could not create show')
+      flash('An error occurred. Show could not be listed.')
+  else:
+    current_app.logger.info('show form rejected', extra={'form_errors': form.errors})
+    flash('An error occurred. Please check the fields and try again', category='error')
+    return render_template('forms/new_show.html', form=ShowForm(request.form, meta={"csrf": False}))
+
+  return render_template('pages/home.html')
+
+@bp.cli.command('refresh-show-counts')
+@click.option('--window', default=60, help='Minutes of shows to move from upcoming to past.')
+@click.option('--all', 'everything', is_flag=True, help='Recount every venue and artist.')
+def refresh_show_counts_command(window, everything):
+  """Moves shows that have started into the past counters.
+
+  Meant to run from cron more often than --window, e.g. every 15 minutes.
+  """
+  now = datetime.now()
+  if everything:
+    refresh_show_counts(now)
+    directory.rebuild()
+  else:
+    started = db.session.query(Show.venue_id, Show.artist_id).filter(
+      Show.start_time > now - timedelta(minutes=window), Show.start_time <= now).all()
+    venue_ids = set(venue_id for venue_id, _ in started)
+    artist_ids = set(artist_id for _, artist_id in started)
+    refresh_show_counts(now, venue_ids=venue_ids, artist_ids=artist_ids)
+    directory.refresh(venue_ids=venue_ids)
+  db.session.commit()
+  # detail pages split past and upcoming shows, so they change as shows start
+  if everything:
+    cache.clear()
+  else:
+    cache.invalidate(*['venue:{}'.format(i) for i in venue_ids] + ['artist:{}'.format(i) for i in artist_ids])
+
+def ensure_archive_partitions(first_year, last_year):
+  # Postgres rejects rows no partition accepts; one partition per year
+  for year in range(first_year, last_year + 1):
+    db.session.execute(text(
+      'CREATE TABLE IF NOT EXISTS "ShowArchive_{0}" PARTITION OF "ShowArchive" '
+      "FOR VALUES FROM ('{0}-01-01') TO ('{1}-01-01')".format(year, year + 1)))
+
+def archive_shows(cutoff, chunk_size):
+  """Moves the shows that ended before cutoff from Show to ShowArchive, one
+  transaction per chunk of ids; returns how many moved. The past counters
+  already include the archive, so they don't change."""
+  span = db.session.query(db.func.min(Show.start_time), db.func.max(Show.start_time)).filter(
+    Show.end_time < cutoff).one()
+  if span[0] is None:
+    return 0
+  if db.engine.dialect.name == 'postgresql':
+    ensure_archive_partitions(span[0].year, span[1].year)
+    db.session.commit()
+  columns = [Show.id, Show.start_time, Show.artist_id, Show.venue_id, Show.end_time]
+  moved = 0
+  while True:
+    ids = [show_id for show_id, in db.session.query(Show.id).filter(
+      Show.end_time < cutoff).order_by(Show.id).limit(chunk_size)]
+    if not ids:
+      return moved
+    db.session.execute(ShowArchive.__table__.insert().from_select(
+      [column.key for column in columns], db.select(columns).where(Show.id.in_(ids))))
+    db.session.query(Show).filter(Show.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    moved += len(ids)
+
+@bp.cli.command('archive-shows')
+@click.option('--horizon-days', type=int, help='Archive shows that ended more than this many days ago (SHOW_ARCHIVE_HORIZON_DAYS).')
+@click.option('--chunk-size', type=int, help='Shows moved per transaction (BULK_CHUNK_SIZE).')
+def archive_shows_command(horizon_days, chunk_size):
+  """Moves long-past shows out of the Show table.
+
+  Upcoming-show queries, conflict checks and availability searches then
+  scan only recent and future bookings. Venue and artist pages still list
+  archived shows as past shows. Meant to run from cron, e.g. nightly.
+  """
+  if horizon_days is None:
+    horizon_days = current_app.config['SHOW_ARCHIVE_HORIZON_DAYS']
+  cutoff = datetime.now() - timedelta(days=horizon_days)
+  moved = archive_shows(cutoff, chunk_size or current_app.config['BULK_CHUNK_SIZE'])
+  if moved:
+    cache.invalidate('shows')
+  click.echo('{} show(s) archived'.format(moved))
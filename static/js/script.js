@@ -2,3 +2,26 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Search box suggestions from /autocomplete, fetched as the user types
+document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+  var kind = input.getAttribute('data-autocomplete');
+  var list = document.getElementById(input.getAttribute('list'));
+  var timer = null;
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    if (!input.value.trim()) return;
+    timer = setTimeout(function () {
+      fetch('/autocomplete?type=' + kind + '&q=' + encodeURIComponent(input.value))
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          list.innerHTML = '';
+          data[kind].forEach(function (item) {
+            var option = document.createElement('option');
+            option.value = item.name;
+            list.appendChild(option);
+          });
+        });
+    }, 100);
+  });
+});
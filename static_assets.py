@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+
+# Output of `flask build-assets`, inside the static folder
+DIST = 'dist'
+# Worth compressing; images and woff fonts are compressed already
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.json', '.txt')
+CSS_URL = re.compile(r'''url\((['"]?)([^'")]+)\1\)''')
+
+
+class StaticAssets(object):
+    """Content-hashed static URLs with far-future caching.
+
+    `flask build-assets` copies every file under static/ to
+    static/dist/<path>.<hash>.<ext>, writes .gz and .br siblings for text
+    files and lists the copies in static/dist/manifest.json. Once the
+    manifest exists, url_for('static', filename='css/main.css') points at
+    the hashed copy, which is served with a one-year immutable
+    Cache-Control and in the best encoding the client accepts. A change
+    to a file changes its URL, so clients never see a stale copy.
+
+    Without a build, static files are served as before. Brotli variants
+    need the `brotli` package at build time.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATIC_MAX_AGE', 365 * 24 * 3600)
+        manifest = {}
+        path = os.path.join(app.static_folder, DIST, 'manifest.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+        # also names the build in the page ETags, so a deploy that changes
+        # templates or assets doesn't answer 304 with an old page
+        version = hashlib.md5(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+        app.extensions['static_assets'] = {'manifest': manifest, 'version': version}
+        app.url_defaults(self._hashed_filename)
+        app.view_functions['static'] = self.send_static_file
+        app.cli.add_command(build_assets_command)
+
+    @property
+    def version(self):
+        return current_app.extensions['static_assets']['version']
+
+    def _hashed_filename(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            manifest = current_app.extensions['static_assets']['manifest']
+            values['filename'] = manifest.get(values['filename'], values['filename'])
+
+    def send_static_file(self, filename):
+        if not filename.startswith(DIST + '/'):
+            return current_app.send_static_file(filename)
+        served = filename
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in request.accept_encodings and os.path.exists(
+                    os.path.join(current_app.static_folder, filename + suffix)):
+                served = filename + suffix
+                break
+        response = send_from_directory(current_app.static_folder, served,
+            mimetype=guess_type(filename), conditional=True)
+        if served != filename:
+            response.content_encoding = 'br' if served.endswith('.br') else 'gzip'
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['STATIC_MAX_AGE']
+        response.cache_control.immutable = True
+        return response
+
+
+def guess_type(filename):
+    # of the file itself, not of its .gz or .br variant
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def build(static_folder, log=print):
+    """Writes static/dist and its manifest; returns the manifest."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        log('brotli is not installed; writing gzip variants only')
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    sources = []
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist)
+        for name in sorted(files):
+            if not name.startswith('.'):
+                sources.append(os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/'))
+    # CSS last, so the fonts and images it points at already have hashed names
+    sources.sort(key=lambda source: source.endswith('.css'))
+
+    manifest = {}
+    for source in sources:
+        with open(os.path.join(static_folder, source), 'rb') as f:
+            content = f.read()
+        if source.endswith('.css'):
+            content = rewrite_css_urls(content.decode('utf-8'), source, manifest).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        stem, extension = posixpath.splitext(source)
+        target = '{}/{}.{}{}'.format(DIST, stem, digest, extension)
+        path = os.path.join(static_folder, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if extension in COMPRESSIBLE and len(content) > 1024:
+            # mtime=0 keeps the .gz bytes the same from build to build
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(content, 9, mtime=0))
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(content, quality=11))
+        manifest[source] = target
+        log('{} -> {}'.format(source, target))
+
+    with open(os.path.join(dist, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def rewrite_css_urls(css, source, manifest):
+    # url(../fonts/x.woff?v=1#y) -> url(x.<hash>.woff?v=1#y), relative to the
+    # stylesheet's own hashed location
+    directory = posixpath.dirname(source)
+
+    def replace(match):
+        quote, url = match.groups()
+        if re.match(r'^([a-z]+:|/|#)', url):
+            return match.group(0)
+        path, suffix = re.match(r'^([^?#]*)(.*)$', url).groups()
+        target = manifest.get(posixpath.normpath(posixpath.join(directory, path)))
+        if target is None:
+            return match.group(0)
+        relative = posixpath.relpath(target, posixpath.join(DIST, directory))
+        return 'url({0}{1}{2}{0})'.format(quote, relative, suffix)
+
+    return CSS_URL.sub(replace, css)
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Writes content-hashed, precompressed copies of static/ to static/dist."""
+    manifest = build(current_app.static_folder, log=click.echo)
+    click.echo('{} files; restart the app to serve them'.format(len(manifest)))
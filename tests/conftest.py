@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# the app's modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+
+
+@pytest.fixture
+def config():
+    # overridden by test modules that need other settings
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, config):
+    # a file rather than :memory:, so parallel.gather runs its queries on
+    # connections of their own as it does against Postgres
+    app = create_app(dict({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///{}'.format(tmp_path / 'test.sqlite'),
+        'TESTING': True,
+        'CACHE_TYPE': 'null',
+        'LOG_FILE': '',
+        'LOG_REQUESTS': False,
+    }, **config))
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Venue, Artist, Show
+
+
+@pytest.fixture
+def show(app):
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street')
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    show = Show(venue=venue, artist=artist, start_time=datetime.now() + timedelta(days=1))
+    db.session.add(show)
+    db.session.commit()
+    return show.id, venue.id, artist.id
+
+
+def rename_venue(venue_id):
+    # the ORM bumps Venue.version, which the tags are built from
+    venue = Venue.query.get(venue_id)
+    venue.name = 'The Dueling Pianos Bar'
+    db.session.commit()
+
+
+@pytest.mark.parametrize('url', ['/api/v1/venues', '/api/v1/artists', '/api/v1/shows'])
+def test_collections_answer_304_until_they_change(client, show, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) == 1
+    etag, _ = response.get_etag()
+    assert client.get(url, headers={'If-None-Match': '"{}"'.format(etag)}).status_code == 304
+
+    _, venue_id, _ = show
+    rename_venue(venue_id)
+    db.session.add(Artist(name='The Wild Sax Band', city='San Francisco', state='CA'))
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': '"{}"'.format(etag)})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+
+def test_details_answer_304_until_they_change(client, show):
+    show_id, venue_id, artist_id = show
+    urls = ['/api/v1/venues/{}'.format(venue_id), '/api/v1/artists/{}'.format(artist_id),
+            '/api/v1/shows/{}'.format(show_id)]
+    etags = {}
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200
+        etags[url], _ = response.get_etag()
+        assert client.get(url, headers={'If-None-Match': '"{}"'.format(etags[url])}).status_code == 304
+
+    # the artist and the show name the venue, so all three change
+    rename_venue(venue_id)
+    for url in urls:
+        response = client.get(url, headers={'If-None-Match': '"{}"'.format(etags[url])})
+        assert response.status_code == 200
+        assert b'The Dueling Pianos Bar' in response.data
@@ -0,0 +1,107 @@
+import pytest
+
+from autocomplete import PrefixIndex, normalize
+from models import Venue
+
+
+@pytest.fixture
+def config():
+    # never rebuild, so only the handlers' own updates reach the index
+    return {'AUTOCOMPLETE_REBUILD_SECONDS': None}
+
+
+def test_normalize():
+    assert normalize('Café  Du-Nord!') == 'cafe du nord'
+    assert normalize('ÉCOLE') == normalize('école') == 'ecole'
+    assert normalize(None) == ''
+
+
+def test_lookup_by_the_start_of_any_word():
+    index = PrefixIndex()
+    index.load([
+        ('venues', 1, 'The Musical Hop', 'The Musical Hop'),
+        ('venues', 2, 'Park Square Live Music & Coffee', 'Park Square'),
+        ('venues', 3, 'The Dueling Pianos Bar', 'The Dueling Pianos Bar'),
+    ])
+    assert index.lookup('venues', 'mus') == ['Park Square', 'The Musical Hop']
+    assert index.lookup('venues', 'the m') == ['The Musical Hop']
+    assert index.lookup('venues', 'the') == ['The Dueling Pianos Bar', 'The Musical Hop']
+    assert index.lookup('venues', 'the', limit=1) == ['The Dueling Pianos Bar']
+    # only the first max_words words are keyed
+    assert index.lookup('venues', 'coffee') == []
+    assert index.lookup('venues', 'usical') == []
+    assert index.lookup('venues', '') == []
+    assert index.lookup('artists', 'mus') == []
+
+
+def test_lookup_folds_case_and_accents():
+    index = PrefixIndex()
+    index.add('artists', 1, 'Beyoncé', 'Beyoncé')
+    index.add('cities', ('São Paulo', 'SP'), 'São Paulo', 'São Paulo')
+    assert index.lookup('artists', 'BEYONCE') == ['Beyoncé']
+    assert index.lookup('artists', 'beyoncé') == ['Beyoncé']
+    assert index.lookup('cities', 'sao p') == ['São Paulo']
+
+
+def test_long_prefixes_are_checked_against_the_full_text():
+    index = PrefixIndex(max_key=4)
+    index.add('venues', 1, 'Musical Hop', 'Musical Hop')
+    index.add('venues', 2, 'Museum Hall', 'Museum Hall')
+    assert index.lookup('venues', 'muse') == ['Museum Hall']
+    assert index.lookup('venues', 'musical h') == ['Musical Hop']
+    assert index.lookup('venues', 'musical x') == []
+
+
+def test_cities_stay_until_their_last_reference_goes():
+    index = PrefixIndex()
+    area = ('San Francisco', 'CA')
+    index.load([('cities', area, 'San Francisco', 'San Francisco')] * 2)
+    index.add('cities', area, 'San Francisco', 'San Francisco')
+    index.remove('cities', area)
+    index.remove('cities', area)
+    assert index.lookup('cities', 'san') == ['San Francisco']
+    index.remove('cities', area)
+    assert index.lookup('cities', 'san') == []
+    assert len(index) == 0
+    # removing what isn't there is a no-op
+    index.remove('cities', area)
+
+
+def venue_form(**fields):
+    data = {
+        'name': 'The Musical Hop',
+        'city': 'San Francisco',
+        'state': 'CA',
+        'address': '1015 Folsom Street',
+        'phone': '123-123-1234',
+        'image_link': 'https://example.com/image.png',
+        'website': 'https://example.com',
+        'facebook_link': 'https://facebook.com/example',
+        'genres': ['Jazz'],
+    }
+    data.update(fields)
+    return data
+
+
+def suggestions(client, prefix):
+    return client.get('/autocomplete?q={}'.format(prefix)).json
+
+
+def test_handlers_update_the_index(app, client):
+    # builds the index while the tables are empty
+    assert suggestions(client, 'mus') == {'venues': [], 'artists': [], 'cities': []}
+
+    client.post('/venues/create', data=venue_form())
+    venue_id = Venue.query.filter_by(name='The Musical Hop').one().id
+    assert suggestions(client, 'mus')['venues'] == [{'id': venue_id, 'name': 'The Musical Hop'}]
+    assert suggestions(client, 'san f')['cities'] == [{'city': 'San Francisco', 'state': 'CA'}]
+
+    client.post('/venues/{}/edit'.format(venue_id), data=venue_form(name='The Dueling Pianos Bar', city='Oakland'))
+    assert suggestions(client, 'mus')['venues'] == []
+    assert suggestions(client, 'duel')['venues'] == [{'id': venue_id, 'name': 'The Dueling Pianos Bar'}]
+    assert suggestions(client, 'san f')['cities'] == []
+    assert suggestions(client, 'oak')['cities'] == [{'city': 'Oakland', 'state': 'CA'}]
+
+    client.post('/venues/{}'.format(venue_id))
+    assert suggestions(client, 'duel') == {'venues': [], 'artists': [], 'cities': []}
+    assert suggestions(client, 'oak')['cities'] == []
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from extensions import db
+from models import Venue, Artist, Show
+from queries import genres_by_name
+from scheduling import available
+
+
+def add_venues():
+    jazz = genres_by_name(['Jazz'])
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', seeking_venue=True, genres=jazz)
+    booked = Venue(name='Booked Venue', city='San Francisco', state='CA', address='1 Main St',
+        seeking_talent=True, genres=jazz)
+    db.session.add_all([
+        booked,
+        Venue(name='Open Venue', city='San Francisco', state='CA', address='2 Main St',
+            seeking_talent=True, genres=jazz),
+        Venue(name='Closed Venue', city='San Francisco', state='CA', address='3 Main St',
+            seeking_talent=False, genres=jazz),
+        Show(venue=booked, artist=artist, start_time=datetime(2030, 1, 2, 20)),
+    ])
+    db.session.commit()
+
+
+def test_only_unbooked_seeking_venues_are_available(client):
+    add_venues()
+    client.get('/')
+    response = client.get('/availability?state=CA&city=san+francisco&genres=Jazz&start=2030-01-01&end=2030-01-07')
+    assert response.status_code == 200
+    assert b'Open Venue' in response.data
+    assert b'Booked Venue' not in response.data
+    assert b'Closed Venue' not in response.data
+    # the artist has the show too
+    assert b'Guns N Petals' not in response.data
+    # a week later the booked venue and the artist are free again
+    response = client.get('/availability?state=CA&city=san+francisco&genres=Jazz&start=2030-01-08&end=2030-01-14')
+    assert b'Booked Venue' in response.data
+    assert b'Guns N Petals' in response.data
+    assert b'Closed Venue' not in response.data
+
+
+def test_search_reads_the_partial_area_index(app):
+    query = available(Venue, 'CA', 'San Francisco', [], datetime(2030, 1, 1), datetime(2030, 1, 8))
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    plan = ' '.join(row[-1] for row in db.session.execute('EXPLAIN QUERY PLAN {}'.format(statement)))
+    assert 'ix_venue_seeking_area' in plan
@@ -0,0 +1,40 @@
+import bulk
+from extensions import db, query_stats
+from forms import VenueForm
+from models import Venue
+
+GENRES = [name for name, _ in VenueForm.genres.kwargs['choices']]
+
+
+def venue_records(count):
+    for number in range(count):
+        yield number + 1, {
+            'name': 'Venue {}'.format(number),
+            'city': 'San Francisco',
+            'state': 'CA',
+            'address': '1 Main St',
+            'phone': '123-123-1234',
+            'image_link': 'https://example.com/{}.png'.format(number),
+            'website': 'https://example.com/{}'.format(number),
+            'facebook_link': 'https://facebook.com/{}'.format(number),
+            'genres': [GENRES[number % len(GENRES)]],
+        }
+
+
+def test_imported_ids_line_up_with_their_rows(app, monkeypatch):
+    # a gap below the highest id: SQLite numbers new rows after the highest
+    for number in range(3):
+        db.session.add(Venue(name='Existing {}'.format(number), city='Oakland', state='CA', address='1 Main St'))
+    db.session.commit()
+    Venue.query.filter_by(name='Existing 1').delete()
+    db.session.commit()
+
+    # seven rows a statement, so 40 rows take six INSERTs
+    monkeypatch.setitem(bulk.BIND_PARAMETER_LIMITS, 'sqlite', len(Venue.__table__.c) * 7)
+    with query_stats.count_queries() as seen:
+        report = bulk.import_records('venues', venue_records(40))
+    assert report['inserted'] == 40
+    assert sum(1 for statement, _ in seen if statement.startswith('INSERT INTO "Venue"')) == 6
+    for number in range(40):
+        venue = Venue.query.filter_by(name='Venue {}'.format(number)).one()
+        assert [genre.name for genre in venue.genres] == [GENRES[number % len(GENRES)]]
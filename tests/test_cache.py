@@ -0,0 +1,50 @@
+import pytest
+
+from extensions import db
+from models import Venue, Artist
+from queries import genres_by_name
+
+
+@pytest.fixture
+def config():
+    return {'CACHE_TYPE': 'lru'}
+
+
+def form(**fields):
+    data = {
+        'city': 'San Francisco',
+        'state': 'CA',
+        'phone': '123-123-1234',
+        'image_link': 'https://example.com/image.png',
+        'website': 'https://example.com',
+        'facebook_link': 'https://facebook.com/example',
+        'genres': ['Jazz'],
+    }
+    data.update(fields)
+    return data
+
+
+def test_artist_genre_edit_reaches_cached_listing(app, client):
+    db.session.add(Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=genres_by_name(['Jazz'])))
+    db.session.commit()
+    url = '/artists?genre=Rock+n+Roll'
+    assert b'Guns N Petals' not in client.get(url).data
+    response = client.post('/artists/1/edit', data=form(name='Guns N Petals', genres=['Rock n Roll']))
+    assert response.status_code == 302
+    # shows the flash message; pages with one pending aren't cached
+    client.get('/')
+    assert b'Guns N Petals' in client.get(url).data
+
+
+def test_venue_genre_edit_reaches_cached_listing(app, client):
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA',
+        address='1015 Folsom Street', genres=genres_by_name(['Jazz'])))
+    db.session.commit()
+    url = '/venues?genre=Rock+n+Roll'
+    assert b'The Musical Hop' not in client.get(url).data
+    response = client.post('/venues/1/edit', data=form(name='The Musical Hop',
+        address='1015 Folsom Street', genres=['Rock n Roll']))
+    assert response.status_code == 302
+    # shows the flash message; pages with one pending aren't cached
+    client.get('/')
+    assert b'The Musical Hop' in client.get(url).data
@@ -0,0 +1,80 @@
+import re
+
+import pytest
+from flask import current_app
+
+import directory
+from extensions import db
+from models import Venue, VenueDirectory
+
+
+@pytest.fixture
+def config():
+    # never reload, so /venues shows only what this worker's commits publish
+    return {'DIRECTORY_RELOAD_SECONDS': None}
+
+
+def venue_form(**fields):
+    data = {
+        'name': 'The Dueling Pianos Bar',
+        'city': 'San Francisco',
+        'state': 'CA',
+        'address': '335 Delancey Street',
+        'phone': '123-123-1234',
+        'image_link': 'https://example.com/image.png',
+        'website': 'https://example.com',
+        'facebook_link': 'https://facebook.com/example',
+        'genres': ['Jazz'],
+    }
+    data.update(fields)
+    return data
+
+
+def listed(client):
+    """[(area, [venue names])] as /venues shows them."""
+    page = client.get('/venues').get_data(as_text=True)
+    return [(area, re.findall(r'<h5>(.*?)\s*</h5>', venues))
+            for area, venues in re.findall(r'<h3>(.*?)</h3>(.*?)</ul>', page, re.DOTALL)]
+
+
+def assert_table_matches(client):
+    # the worker's copy is what a fresh load of the table gives
+    copy = listed(client)
+    current_app.extensions['venue_directory']['loaded'] = None
+    assert listed(client) == copy
+
+
+def test_venues_follow_the_handlers(app, client):
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street'))
+    db.session.commit()
+    client.get('/')
+    assert listed(client) == [('San Francisco, CA', ['The Musical Hop'])]
+
+    client.post('/venues/create', data=venue_form())
+    client.get('/')
+    assert listed(client) == [('San Francisco, CA', ['The Dueling Pianos Bar', 'The Musical Hop'])]
+    # the first refresh builds every area
+    assert VenueDirectory.query.count() == 1
+    assert_table_matches(client)
+
+    venue_id = Venue.query.filter_by(name='The Dueling Pianos Bar').one().id
+    client.post('/venues/{}/edit'.format(venue_id), data=venue_form(city='Oakland'))
+    client.get('/')
+    assert listed(client) == [('Oakland, CA', ['The Dueling Pianos Bar']), ('San Francisco, CA', ['The Musical Hop'])]
+    assert_table_matches(client)
+
+    client.post('/venues/{}'.format(Venue.query.filter_by(name='The Musical Hop').one().id))
+    assert listed(client) == [('Oakland, CA', ['The Dueling Pianos Bar'])]
+    assert [(row.city, row.state) for row in VenueDirectory.query] == [('Oakland', 'CA')]
+    assert_table_matches(client)
+
+
+def test_failed_commit_publishes_nothing(app, client):
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street'))
+    db.session.commit()
+    assert listed(client) == [('San Francisco, CA', ['The Musical Hop'])]
+    db.session.add(Venue(name='Rolled Back', city='Oakland', state='CA', address='1 Main St'))
+    db.session.flush()
+    directory.refresh(areas=[('Oakland', 'CA')])
+    db.session.rollback()
+    assert listed(client) == [('San Francisco, CA', ['The Musical Hop'])]
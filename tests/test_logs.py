@@ -0,0 +1,30 @@
+import json
+
+import logs
+from app import create_app
+from extensions import db
+
+
+def test_newest_app_takes_over_the_shared_logger(tmp_path):
+    apps = [create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'TESTING': True,
+        'LOG_FILE': str(tmp_path / 'app{}.log'.format(number)),
+    }) for number in range(2)]
+    first, second = [app.extensions['structured_logging']['listener'] for app in apps]
+    assert apps[0].logger is apps[1].logger
+    handlers = [handler for handler in apps[1].logger.handlers if isinstance(handler, logs.RequestQueueHandler)]
+    assert [handler.listener for handler in handlers] == [second]
+    assert first._thread is None
+
+    with apps[1].app_context():
+        db.create_all()
+    response = apps[1].test_client().get('/', headers={'X-Request-ID': 'abc-123'})
+    assert response.headers['X-Request-ID'] == 'abc-123'
+    logs.stop(second)
+
+    assert (tmp_path / 'app0.log').read_text() == ''
+    entry = json.loads((tmp_path / 'app1.log').read_text().splitlines()[-1])
+    assert entry['request_id'] == 'abc-123'
+    assert entry['route'] == 'index'
+    assert entry['status'] == 200
@@ -0,0 +1,155 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db, query_stats
+from models import Venue, Artist, Show, ShowArchive
+from queries import genres_by_name, refresh_show_counts
+
+
+def add_venues(count, start=0):
+    """Adds `count` venues spread over three areas, each with a genre and
+    an upcoming show."""
+    now = datetime.now()
+    artist = Artist(name='Seed Artist', city='San Francisco', state='CA')
+    jazz = genres_by_name(['Jazz'])
+    for number in range(start, start + count):
+        venue = Venue(name='Venue {}'.format(number), city='City {}'.format(number % 3),
+            state='CA', address='1 Main St', genres=jazz)
+        db.session.add(Show(venue=venue, artist=artist, start_time=now + timedelta(days=1)))
+    db.session.flush()
+    refresh_show_counts(now)
+    db.session.commit()
+
+
+def add_shows(count):
+    """A venue and an artist with `count` past, `count` upcoming and one
+    archived show together; returns their ids."""
+    now = datetime.now()
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street')
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    for day in range(1, count + 1):
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=now - timedelta(days=day)))
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=now + timedelta(days=day)))
+    start = now - timedelta(days=800)
+    db.session.add(ShowArchive(id=100000 + venue.id, venue_id=venue.id, artist_id=artist.id,
+        start_time=start, end_time=start + Show.DEFAULT_DURATION))
+    db.session.flush()
+    refresh_show_counts(now)
+    db.session.commit()
+    return venue.id, artist.id
+
+
+def statements(client, url):
+    with query_stats.count_queries() as seen:
+        response = client.get(url)
+        assert response.status_code == 200
+    return len(seen)
+
+
+def test_venues_query_count_does_not_grow_with_venues(app, client):
+    # reread the directory on every request, so each one queries for it
+    app.config['DIRECTORY_RELOAD_SECONDS'] = 0
+    add_venues(5)
+    # the first request also builds the autocomplete index
+    client.get('/venues')
+    few = statements(client, '/venues')
+    add_venues(45, start=5)
+    many = statements(client, '/venues')
+    assert few == many
+    response = query_stats.assert_max_queries(client, '/venues', 3)
+    assert b'Venue 49' in response.data
+
+
+def test_detail_pages_stay_within_budget(app, client):
+    venue_id, artist_id = add_shows(2)
+    client.get('/')
+    # the ETag fingerprint, then the row, its genres, its upcoming shows
+    # and its past shows
+    for url, other in (('/venues/{}'.format(venue_id), b'Guns N Petals'),
+                       ('/artists/{}'.format(artist_id), b'The Musical Hop')):
+        response = query_stats.assert_max_queries(client, url, 5)
+        assert response.status_code == 200
+        assert b'2 Upcoming Shows' in response.data
+        assert b'3 Past Shows' in response.data
+        assert other in response.data
+
+
+def test_detail_query_count_does_not_grow_with_shows(app, client):
+    few_venue, few_artist = add_shows(2)
+    many_venue, many_artist = add_shows(20)
+    client.get('/')
+    assert statements(client, '/venues/{}'.format(few_venue)) == statements(client, '/venues/{}'.format(many_venue))
+    assert statements(client, '/artists/{}'.format(few_artist)) == statements(client, '/artists/{}'.format(many_artist))
+
+
+def test_search_stays_within_budget(app, client):
+    # the FTS tables come from db.create_all() here, not the migration
+    add_venues(5)
+    client.get('/')
+    response = query_stats.assert_max_queries(client, '/venues/search?search_term=Venue+3', 2)
+    assert b'Venue 3' in response.data
+    response = query_stats.assert_max_queries(client, '/artists/search?search_term=Seed', 2)
+    assert b'Seed Artist' in response.data
+
+
+def test_bulk_import_inserts_each_chunk_at_once(app, client):
+    lines = ['name,city,state,address,phone,genres,website,image_link,facebook_link']
+    lines += ['Venue {0},City {1},CA,1 Main St,123-123-1234,Jazz;Folk,https://venue{0}.com,'
+              'https://venue{0}.com/logo.png,https://facebook.com/venue{0}'.format(number, number % 3)
+              for number in range(50)]
+    client.get('/')
+    with query_stats.count_queries() as seen:
+        response = client.post('/import/venues', data={
+            'file': (io.BytesIO('\n'.join(lines).encode()), 'venues.csv')})
+    assert response.json['inserted'] == 50
+    inserts = [statement for statement, _ in seen if statement.startswith('INSERT INTO')]
+    assert sum(1 for statement in inserts if statement.startswith('INSERT INTO "Venue"')) == 1
+    assert sum(1 for statement in inserts if statement.startswith('INSERT INTO venue_genres')) == 1
+    assert Venue.query.filter_by(name='Venue 49').one().genres[1].name == 'Jazz'
+
+
+def test_going_over_budget_fails_in_testing(app, client):
+    @query_stats.budget(1)
+    def two_queries():
+        Venue.query.count()
+        Artist.query.count()
+        return 'counted'
+    app.add_url_rule('/two-queries', 'two_queries', two_queries)
+    with pytest.raises(AssertionError, match='two_queries ran 2 queries, budget is 1'):
+        client.get('/two-queries')
+    # the test helper checks the statements without a budget on the view
+    two_queries.query_budget = None
+    with pytest.raises(AssertionError, match='/two-queries ran 2 queries, budget is 1'):
+        query_stats.assert_max_queries(client, '/two-queries', 1)
+
+
+def test_server_timing_header(app, client):
+    venue_id, _ = add_shows(1)
+    app.config['SERVER_TIMING'] = True
+    client.get('/')
+    timings = client.get('/venues/{}'.format(venue_id)).headers.getlist('Server-Timing')
+    assert timings[0].startswith('db;dur=')
+    assert timings[0].endswith(';desc="5 queries"')
+    assert timings[1].startswith('app;dur=')
+    app.config['SERVER_TIMING'] = False
+    assert 'Server-Timing' not in client.get('/venues/{}'.format(venue_id)).headers
+
+
+def test_metrics(app, client):
+    venue_id, _ = add_shows(1)
+    app.config['SLOW_QUERY_SECONDS'] = 0
+    client.get('/venues/{}'.format(venue_id))
+    client.get('/venues/0')
+    app.config['SLOW_QUERY_SECONDS'] = 0.1
+    metrics = client.get('/metrics')
+    assert metrics.mimetype == 'text/plain'
+    lines = metrics.get_data(as_text=True).splitlines()
+    assert '# TYPE fyyur_requests_total counter' in lines
+    assert any(line.startswith('fyyur_requests_total{endpoint="venues.show_venue",status="200"} ') for line in lines)
+    assert any(line.startswith('fyyur_requests_total{endpoint="venues.show_venue",status="404"} ') for line in lines)
+    assert any(line.startswith('fyyur_db_queries_total{endpoint="venues.show_venue",status="200"} ') for line in lines)
+    assert any(line.startswith('fyyur_slow_query_seconds{rank="1",') for line in lines)
@@ -0,0 +1,63 @@
+import shutil
+
+import pytest
+from flask import g
+
+from extensions import db
+from models import Venue
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {'SQLALCHEMY_REPLICA_URIS': ['sqlite:///{}'.format(tmp_path / 'replica.sqlite')]}
+
+
+@pytest.fixture
+def venue_id(app, tmp_path):
+    """A venue named 'On the replica' on the replica and 'On the primary'
+    on the primary."""
+    venue = Venue(name='On the replica', city='San Francisco', state='CA', address='1015 Folsom Street')
+    db.session.add(venue)
+    db.session.commit()
+    venue_id = venue.id
+    db.session.remove()
+    shutil.copy(str(tmp_path / 'test.sqlite'), str(tmp_path / 'replica.sqlite'))
+    venue = Venue.query.get(venue_id)
+    venue.name = 'On the primary'
+    db.session.commit()
+    return venue_id
+
+
+def test_read_only_views_read_from_the_replica(client, venue_id):
+    assert b'On the replica' in client.get('/venues/{}'.format(venue_id)).data
+    assert b'On the replica' in client.get('/api/v1/venues/{}'.format(venue_id)).data
+
+
+def test_post_pins_the_client_to_the_primary(app, client, venue_id):
+    url = '/venues/{}'.format(venue_id)
+    # an invalid edit still counts as a possible write
+    client.post('{}/edit'.format(url), data={'name': ''})
+    assert b'On the primary' in client.get(url).data
+    # other clients keep reading from the replica
+    assert b'On the replica' in app.test_client().get(url).data
+
+    app.config['REPLICA_STICKY_SECONDS'] = -1
+    client.post('{}/edit'.format(url), data={'name': ''})
+    assert b'On the replica' in client.get(url).data
+
+
+def names(app, bind=None):
+    """Venue names straight from one database, past any session routing."""
+    engine = db.get_engine(app, bind=bind)
+    return [name for name, in engine.execute('SELECT name FROM "Venue" ORDER BY id')]
+
+
+def test_flushes_go_to_the_primary(app, venue_id):
+    # the read goes to the replica, the insert and its commit to the primary
+    with app.test_request_context():
+        g.db_replica = 'replica0'
+        assert Venue.query.get(venue_id).name == 'On the replica'
+        db.session.add(Venue(name='Added', city='Oakland', state='CA', address='1 Main St'))
+        db.session.commit()
+    assert names(app) == ['On the primary', 'Added']
+    assert names(app, 'replica0') == ['On the replica']
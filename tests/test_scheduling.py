@@ -0,0 +1,179 @@
+import io
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Venue, Artist, Show
+from scheduling import (IntervalTree, MAX_OCCURRENCES, occurrences, schedule_conflicts, overlapping_pairs,
+                        existing_conflicts)
+
+START = datetime(2030, 1, 1, 20)
+
+
+def at(hours, duration=2):
+    start = START + timedelta(hours=hours)
+    return start, start + timedelta(hours=duration)
+
+
+def row(venue_id, artist_id, hours, duration=2):
+    start_time, end_time = at(hours, duration)
+    return {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time, 'end_time': end_time}
+
+
+def add_venues_and_artists(count):
+    venues = [Venue(name='Venue {}'.format(number), city='San Francisco', state='CA', address='1 Main St')
+              for number in range(count)]
+    artists = [Artist(name='Artist {}'.format(number), city='San Francisco', state='CA')
+               for number in range(count)]
+    db.session.add_all(venues + artists)
+    db.session.commit()
+    return [venue.id for venue in venues], [artist.id for artist in artists]
+
+
+def test_single_show():
+    assert occurrences(START) == [START]
+
+
+def test_weekly_with_count():
+    assert occurrences(START, 'weekly', interval=2, count=3) == [
+        START, START + timedelta(weeks=2), START + timedelta(weeks=4)]
+
+
+def test_monthly_until_a_day():
+    # the last day counts, whatever the time of the show
+    assert occurrences(START, 'monthly', until=date(2030, 4, 1)) == [
+        START, datetime(2030, 2, 1, 20), datetime(2030, 3, 1, 20), datetime(2030, 4, 1, 20)]
+    with pytest.raises(ValueError, match='Give a number of shows or a last date.'):
+        occurrences(START, 'monthly')
+
+
+def test_list_of_dates():
+    dates = '2030-01-08\n\n2030-01-03 18:30; 2030-01-08'
+    assert occurrences(START, 'dates', dates=dates) == [datetime(2030, 1, 3, 18, 30), datetime(2030, 1, 8, 20)]
+    with pytest.raises(ValueError, match='Not a date: next friday'):
+        occurrences(START, 'dates', dates='2030-01-08\nnext friday')
+    with pytest.raises(ValueError, match='The schedule has no dates.'):
+        occurrences(START, 'dates', dates=' ; ')
+
+
+def test_rrule():
+    assert occurrences(START, 'rrule', rule='FREQ=DAILY;INTERVAL=3;COUNT=3') == [
+        START, START + timedelta(days=3), START + timedelta(days=6)]
+    with pytest.raises(ValueError, match='Not a valid RRULE'):
+        occurrences(START, 'rrule', rule='FREQ=SOMETIMES')
+
+
+def test_rrule_runs_from_the_start_time():
+    # a DTSTART copied from a calendar doesn't move the first show
+    rule = 'DTSTART:20250101T100000 RRULE:FREQ=WEEKLY;COUNT=2'
+    assert occurrences(START, 'rrule', rule=rule) == [START, START + timedelta(weeks=1)]
+    rule = 'DTSTART;TZID=Europe/Lisbon:20250101T100000\nRRULE:FREQ=WEEKLY;UNTIL=20300115T235959Z'
+    assert occurrences(START, 'rrule', rule=rule) == [START, START + timedelta(weeks=1), START + timedelta(weeks=2)]
+
+
+def test_unbounded_rrule_is_capped():
+    with pytest.raises(ValueError, match='A booking can create at most {} shows.'.format(MAX_OCCURRENCES)):
+        occurrences(START, 'rrule', rule='FREQ=DAILY')
+    assert len(occurrences(START, 'rrule', rule='FREQ=DAILY;COUNT={}'.format(MAX_OCCURRENCES))) == MAX_OCCURRENCES
+
+
+def test_interval_tree_matches_a_scan():
+    generator = random.Random(7)
+    intervals = []
+    for number in range(200):
+        start = generator.randrange(1000)
+        intervals.append((start, start + generator.randrange(1, 50), number))
+    tree = IntervalTree(intervals)
+    for _ in range(200):
+        start = generator.randrange(1000)
+        end = start + generator.randrange(1, 50)
+        expected = [number for first, last, number in intervals if first < end and last > start]
+        assert sorted(tree.overlapping(start, end)) == expected
+
+
+def test_interval_tree_intervals_are_half_open():
+    tree = IntervalTree([(0, 10, 'a'), (10, 20, 'b')])
+    assert tree.overlapping(10, 15) == ['b']
+    assert tree.overlapping(5, 10) == ['a']
+    assert sorted(tree.overlapping(9, 11)) == ['a', 'b']
+    assert IntervalTree([]).overlapping(0, 10) == []
+
+
+def test_rows_of_one_batch_conflict(app):
+    rows = [row(1, 1, 0), row(1, 2, 1), row(2, 1, 1.5), row(3, 3, 0)]
+    assert sorted(overlapping_pairs(rows)) == [('artist_id', 0, 2), ('venue_id', 0, 1)]
+    assert schedule_conflicts(rows) == {
+        1: ['Overlaps row 1 of this batch at the same venue.'],
+        2: ['Overlaps row 1 of this batch at the same artist.'],
+    }
+
+
+def test_touching_shows_do_not_conflict(app):
+    (venue_id,), (artist_id,) = add_venues_and_artists(1)
+    start_time, end_time = at(0)
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=end_time))
+    db.session.commit()
+    # one ends as the other starts, before and after the booked show
+    rows = [row(venue_id, artist_id, -2), row(venue_id, artist_id, 2)]
+    assert list(overlapping_pairs(rows)) == []
+    assert schedule_conflicts(rows) == {}
+    assert list(existing_conflicts()) == []
+
+
+def test_other_venue_and_artist_at_the_same_time_do_not_conflict(app):
+    venue_ids, artist_ids = add_venues_and_artists(2)
+    start_time, end_time = at(0)
+    db.session.add(Show(venue_id=venue_ids[0], artist_id=artist_ids[0], start_time=start_time, end_time=end_time))
+    db.session.commit()
+    assert schedule_conflicts([row(venue_ids[1], artist_ids[1], 0), row(venue_ids[1], artist_ids[1], 2)]) == {}
+
+
+def test_conflicts_with_booked_shows(app):
+    venue_ids, artist_ids = add_venues_and_artists(2)
+    start_time, end_time = at(0)
+    show = Show(venue_id=venue_ids[0], artist_id=artist_ids[0], start_time=start_time, end_time=end_time)
+    db.session.add(show)
+    db.session.commit()
+    message = 'Overlaps show {} (2030-01-01 20:00-22:00) at venue {} with artist {}.'.format(
+        show.id, venue_ids[0], artist_ids[0])
+    conflicts = schedule_conflicts([
+        row(venue_ids[0], artist_ids[1], 1),
+        row(venue_ids[1], artist_ids[0], -1),
+        row(venue_ids[1], artist_ids[1], 3),
+    ])
+    assert conflicts == {0: [message], 1: [message]}
+    # the same venue and artist: reported once
+    assert schedule_conflicts([row(venue_ids[0], artist_ids[0], 0.5, 1)]) == {0: [message]}
+
+
+def test_existing_conflicts(app):
+    venue_ids, artist_ids = add_venues_and_artists(2)
+    shows = []
+    for venue_id, artist_id, hours in ((venue_ids[0], artist_ids[0], 0), (venue_ids[0], artist_ids[1], 1),
+                                       (venue_ids[1], artist_ids[1], 2), (venue_ids[1], artist_ids[0], 4)):
+        start_time, end_time = at(hours)
+        shows.append(Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=end_time))
+    db.session.add_all(shows)
+    db.session.commit()
+    found = [(key, first.id, second.id) for key, first, second in existing_conflicts()]
+    assert found == [('venue_id', shows[0].id, shows[1].id), ('artist_id', shows[1].id, shows[2].id)]
+
+
+def test_import_rejects_overlapping_rows(app, client):
+    venue_ids, artist_ids = add_venues_and_artists(2)
+    lines = ['venue_id,artist_id,start_time,duration']
+    lines += ['{},{},{:%Y-%m-%d %H:%M:%S},{}'.format(venue_id, artist_id, start_time, minutes)
+              for venue_id, artist_id, start_time, minutes in (
+                  (venue_ids[0], artist_ids[0], START, 120),
+                  (venue_ids[0], artist_ids[1], START + timedelta(hours=1), 60),
+                  (venue_ids[1], artist_ids[0], START + timedelta(hours=2), 60))]
+    response = client.post('/import/shows', data={
+        'file': (io.BytesIO('\n'.join(lines).encode()), 'shows.csv')})
+    assert response.status_code == 422
+    assert response.json['inserted'] == 2
+    errors = response.json['errors']
+    assert [error['errors'] for error in errors] == [
+        {'start_time': ['Overlaps row 1 of this batch at the same venue.']}]
+    assert Show.query.count() == 2
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Venue, Artist, Show, ShowArchive
+from queries import detail_queries, refresh_show_counts
+
+
+def add_pair():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street')
+    artist = Artist(name='Guns N Petals', city='San Francisco', state='CA')
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    return venue, artist
+
+
+def test_show_starting_now_is_past_everywhere(app):
+    now = datetime(2030, 1, 1, 20)
+    venue, artist = add_pair()
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=now))
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=now + timedelta(minutes=1)))
+    db.session.flush()
+    refresh_show_counts(now)
+    db.session.commit()
+    _, _, upcoming, past = [db.session.execute(getattr(query, 'statement', query)).fetchall()
+                            for query in detail_queries(Venue, venue.id, now)]
+    assert [show.start_time for show in upcoming] == [now + timedelta(minutes=1)]
+    assert [show.start_time for show in past] == [now]
+    venue = Venue.query.get(venue.id)
+    assert (venue.upcoming_shows_count, venue.past_shows_count) == (1, 1)
+
+
+def test_recurring_booking_updates_the_counters(client):
+    now = datetime.now().replace(microsecond=0)
+    venue, artist = add_pair()
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=now - timedelta(weeks=3)))
+    db.session.commit()
+    venue_id, artist_id = venue.id, artist.id
+    # every week from two weeks ago: two past shows and two upcoming ones
+    response = client.post('/shows/create', data={
+        'venue_id': venue_id,
+        'artist_id': artist_id,
+        'start_time': '{:%Y-%m-%d %H:%M:%S}'.format(now - timedelta(weeks=2) + timedelta(hours=1)),
+        'duration': 60,
+        'repeat': 'weekly',
+        'count': 4,
+    })
+    assert b'4 shows successfully listed!' in response.data
+    assert Show.query.count() == 5
+    for model, ident in ((Venue, venue_id), (Artist, artist_id)):
+        entity = model.query.get(ident)
+        assert (entity.upcoming_shows_count, entity.past_shows_count) == (2, 3)
+
+
+def test_archived_shows_stay_listed(app, client):
+    now = datetime.now()
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street')
+    # one artist a show, so the pages show which ones are listed
+    shows = [Show(venue=venue, artist=Artist(name=name, city='San Francisco', state='CA'), start_time=now + age)
+             for name, age in (('Old Artist', -timedelta(days=400)), ('Older Artist', -timedelta(days=500)),
+                               ('Recent Artist', -timedelta(days=2)), ('Next Artist', timedelta(days=2)))]
+    db.session.add_all(shows)
+    db.session.flush()
+    refresh_show_counts(now)
+    db.session.commit()
+    venue_id, artist_id = venue.id, shows[0].artist_id
+    old_id, older_id, recent_id, next_id = [show.id for show in shows]
+
+    result = app.test_cli_runner().invoke(args=['archive-shows', '--horizon-days', '30', '--chunk-size', '1'])
+    assert result.exit_code == 0, result.output
+    assert result.output == '2 show(s) archived\n'
+    assert sorted(show.id for show in ShowArchive.query) == [old_id, older_id]
+    assert sorted(show.id for show in Show.query) == [recent_id, next_id]
+    venue = Venue.query.get(venue_id)
+    assert (venue.upcoming_shows_count, venue.past_shows_count) == (1, 3)
+
+    client.get('/')
+    page = client.get('/venues/{}'.format(venue_id)).data
+    assert b'3 Past Shows' in page
+    for name in (b'Old Artist', b'Older Artist', b'Recent Artist', b'Next Artist'):
+        assert name in page
+    page = client.get('/artists/{}'.format(artist_id)).data
+    assert b'1 Past Show' in page
+    assert b'The Musical Hop' in page
+    response = client.get('/api/v1/shows/{}'.format(old_id))
+    assert response.status_code == 200
+    assert response.json['artist_name'] == 'Old Artist'
+    # the feed lists Show alone
+    page = client.get('/shows').data
+    assert b'Recent Artist' in page
+    assert b'Old Artist' not in page
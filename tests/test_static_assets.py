@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import json
+
+import pytest
+from flask import Flask, url_for
+
+from static_assets import StaticAssets, build, rewrite_css_urls
+
+# over the 1 KiB below which nothing is compressed
+CSS = 'body { font-family: "Glyphs"; }\n' * 40 + (
+    '@font-face { src: url("../fonts/glyphs.woff?v=2#icons"); }\n'
+    '.logo { background: url(../img/logo.png); }\n'
+    '.remote { background: url(https://example.com/x.png); }\n'
+    '.missing { background: url(../img/missing.png); }\n'
+)
+
+
+@pytest.fixture
+def static(tmp_path):
+    static = tmp_path / 'static'
+    for path, content in (('css/main.css', CSS.encode()), ('fonts/glyphs.woff', b'woff' * 400),
+                          ('img/logo.png', b'png'), ('.hidden', b'x')):
+        (static / path).parent.mkdir(parents=True, exist_ok=True)
+        (static / path).write_bytes(content)
+    return static
+
+
+def digest(content):
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def test_build_writes_hashed_copies(static):
+    manifest = build(str(static), log=lambda message: None)
+    assert json.loads((static / 'dist' / 'manifest.json').read_text()) == manifest
+    assert sorted(manifest) == ['css/main.css', 'fonts/glyphs.woff', 'img/logo.png']
+    assert manifest['img/logo.png'] == 'dist/img/logo.{}.png'.format(digest(b'png'))
+    assert manifest['fonts/glyphs.woff'] == 'dist/fonts/glyphs.{}.woff'.format(digest(b'woff' * 400))
+
+    css = (static / manifest['css/main.css']).read_text()
+    assert manifest['css/main.css'] == 'dist/css/main.{}.css'.format(digest(css.encode()))
+    assert 'url("../fonts/glyphs.{}.woff?v=2#icons")'.format(digest(b'woff' * 400)) in css
+    assert 'url(../img/logo.{}.png)'.format(digest(b'png')) in css
+    assert 'url(https://example.com/x.png)' in css
+    assert 'url(../img/missing.png)' in css
+
+    # text files get a compressed copy; fonts and small files don't
+    assert gzip.decompress((static / (manifest['css/main.css'] + '.gz')).read_bytes()) == css.encode()
+    assert not (static / (manifest['fonts/glyphs.woff'] + '.gz')).exists()
+    assert not (static / (manifest['img/logo.png'] + '.gz')).exists()
+
+    # a rebuild gives the same names and bytes
+    gz = (static / (manifest['css/main.css'] + '.gz')).read_bytes()
+    assert build(str(static), log=lambda message: None) == manifest
+    assert (static / (manifest['css/main.css'] + '.gz')).read_bytes() == gz
+
+
+def test_build_writes_brotli_copies(static):
+    brotli = pytest.importorskip('brotli')
+    manifest = build(str(static), log=lambda message: None)
+    css = (static / manifest['css/main.css']).read_bytes()
+    assert brotli.decompress((static / (manifest['css/main.css'] + '.br')).read_bytes()) == css
+
+
+def test_rewrite_css_urls_is_relative_to_the_stylesheet():
+    manifest = {'img/logo.png': 'dist/img/logo.abc.png', 'css/img/bg.png': 'dist/css/img/bg.def.png'}
+    css = "a { background: url('../img/logo.png'); } b { background: url(img/bg.png); } c { background: url(#x); }"
+    assert rewrite_css_urls(css, 'css/main.css', manifest) == (
+        "a { background: url('../img/logo.abc.png'); } b { background: url(img/bg.def.png); } "
+        "c { background: url(#x); }")
+
+
+def test_hashed_files_are_served_immutable(static):
+    manifest = build(str(static), log=lambda message: None)
+    app = Flask(__name__, static_folder=str(static))
+    StaticAssets(app)
+    with app.test_request_context():
+        url = url_for('static', filename='css/main.css')
+    assert url == '/static/' + manifest['css/main.css']
+
+    client = app.test_client()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/css'
+    assert response.content_encoding == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    cache_control = response.cache_control
+    assert cache_control.public and cache_control.immutable
+    assert cache_control.max_age == 365 * 24 * 3600
+    assert gzip.decompress(response.data) == (static / manifest['css/main.css']).read_bytes()
+    response.close()
+
+    response = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert response.content_encoding is None
+    assert response.data == (static / manifest['css/main.css']).read_bytes()
+    response.close()
+
+    # files outside dist are served as before
+    response = client.get('/static/img/logo.png')
+    assert response.data == b'png'
+    assert not response.cache_control.immutable
+    response.close()
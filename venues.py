@@ -0,0 +1,265 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import flag_modified
+
+import autocomplete
+import directory
+from extensions import db, cache, query_stats, parallel
+from formatting import format_datetimes
+from forms import VenueForm
+from models import Venue, Show, ShowArchive
+from queries import (decode_cursor, encode_cursor, keyset_query, split_page,
+  count_query, refresh_show_counts, genres_by_name, genre_filter, text_search, detail_queries,
+  detail_fingerprint)
+
+bp = Blueprint('venues', __name__)
+
+# the budget comes into play only when this worker (re)loads the directory
+# snapshots; otherwise /venues runs no queries
+@bp.route('/venues')
+@db.read_only
+@query_stats.budget(3)
+@cache.cached
+def venues():
+  data = []
+  genres = request.args.getlist('genre')
+  cache.tag('venues')
+  # the per-area snapshots in memory, see directory.py; no queries
+  for (city, state), entries in directory.listing():
+    entries = [entry for entry in entries if all(genre in entry[4] for genre in genres)]
+    if not entries:
+      continue
+    cache.tag('area:{}/{}'.format(city, state))
+    data.append({
+      'city': city,
+      'state': state,
+      'venues': [{
+        'id': venue_id,
+        'name': name,
+        'num_upcoming_shows': num_upcoming_shows,
+        'version': version
+      } for venue_id, name, num_upcoming_shows, version, _ in entries]
+    })
+
+  return render_template('pages/venues.html', areas=data, genres=genres)
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+@db.read_only
+@query_stats.budget(2)
+def search_venues():
+  search_term=request.values.get('search_term', '')
+  genres = request.values.getlist('genre')
+  after = request.values.get('after')
+  if after:
+    after = decode_cursor(after, float, str, int)
+  query, rank = text_search(db.session.query(Venue), Venue, search_term)
+  query = query.filter(genre_filter(Venue, genres))
+  # best matches first; name and id break ties and keep the cursor unique
+  page = query.with_entities(
+    Venue.id,
+    Venue.name,
+    Venue.upcoming_shows_count,
+    -rank
+  )
+  # the count and the page don't depend on each other
+  counted, rows = parallel.gather(count_query(query), keyset_query(page, [-rank, Venue.name, Venue.id], after))
+  count = counted[0][0]
+  venues, has_more = split_page(rows)
+  data = [{
+    'id': venue_id,
+    'name': name,
+    'num_upcoming_shows': num_upcoming_shows
+  } for venue_id, name, num_upcoming_shows, _ in venues]
+
+  response={
+    "count": count,
+    "data": data,
+    "next_cursor": encode_cursor(venues[-1][3], venues[-1][1], venues[-1][0]) if has_more else None
+  }
+  return render_template('pages/search_venues.html', results=response, search_term=search_term, genres=genres)
+
+@bp.route('/venues/<int:venue_id>')
+@db.read_only
+@query_stats.budget(5)
+@cache.conditional(lambda venue_id: detail_fingerprint(Venue, venue_id, datetime.now()))
+@cache.cached
+def show_venue(venue_id):
+  now = datetime.now()
+  # the row, its genres and its upcoming and past shows, all at once
+  rows, genres, upcoming_shows, past_shows = parallel.gather(*detail_queries(Venue, venue_id, now))
+  if not rows:
+    abort(404)
+  venue = rows[0]
+  past_times = format_datetimes([show.start_time for show in past_shows], 'full')
+  upcoming_times = format_datetimes([show.start_time for show in upcoming_shows], 'full')
+  cache.tag('venue:{}'.format(venue.id), *['artist:{}'.format(show.other_id) for show in upcoming_shows + past_shows])
+  data = {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": [name for name, in genres],
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": [{
+      "artist_id": show.other_id,
+      "artist_name": show.other_name,
+      "artist_image_link": show.other_image_link,
+      "start_time": start_time
+    } for show, start_time in zip(past_shows, past_times) ],
+    "upcoming_shows": [{
+      "artist_id": show.other_id,
+      "artist_name": show.other_name,
+      "artist_image_link": show.other_image_link,
+      "start_time": start_time
+    } for show, start_time in zip(upcoming_shows, upcoming_times) ],
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows),
+  }
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  form = VenueForm(request.form, meta={"csrf": False})
+  if form.validate_on_submit():
+    current_app.logger.debug('venue form validated')
+    try:
+      seeking_talent = False
+      seeking_description = ''
+      if 'seeking_talent' in request.form:
+        seeking_talent = form.seeking_talent.data
+        if 'seeking_description' in request.form:
+          seeking_description = form.seeking_description.data
+      artist = Venue(name=form.name.data)
+      artist.city = form.city.data
+      artist.state = form.state.data
+      artist.address = form.address.data
+      artist.phone = form.phone.data
+      artist.image_link = form.image_link.data
+      artist.website = form.website.data
+      artist.genres = genres_by_name(form.genres.data)
+      artist.facebook_link = form.facebook_link.data
+      artist.seeking_talent = seeking_talent
+      artist.seeking_description = seeking_description
+      db.session.add(artist)
+      directory.refresh(areas=[(artist.city, artist.state)])
+      db .session.commit()
+      cache.invalidate('venues')
+      autocomplete.entity_saved('venues', artist)
+      flash('Venue ' + artist.name + ' was successfully listed!')
+    except SQLAlchemyError:
+      db.session.rollback()
+      current_app.logger.exception('could not create venue')
+      flash('An error occurred. Venue ' + artist.name + ' could not be listed.')
+  else:
+    current_app.logger.info('venue form rejected', extra={'form_errors': form.errors})
+    flash('An error occurred. Please check the fields and try again', category='error')
+    return render_template('forms/new_venue.html', form=VenueForm(request.form, meta={"csrf": False}))
+
+  return render_template('pages/home.html')
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  venue = Venue.query.get(venue_id)
+  form = VenueForm(obj=venue)
+  form.genres.data = [genre.name for genre in venue.genres]
+  data ={
+    "id": venue.id,
+    "name": venue.name,
+    "genres": [genre.name for genre in venue.genres],
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link
+  }
+  return render_template('forms/edit_venue.html', form=form, venue=data)
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  form = VenueForm(request.form, meta={"csrf": False})
+  if form.validate_on_submit():
+    current_app.logger.debug('venue form validated')
+    try:
+      venue = Venue.query.get(venue_id)
+      old_city, old_state = venue.city, venue.state
+      seeking_talent = False
+      seeking_description = ''
+      if 'seeking_talent' in request.form:
+        seeking_talent = form.seeking_talent.data
+        if 'seeking_description' in request.form:
+          seeking_description = form.seeking_description.data
+      venue.name = form.name.data
+      venue.city = form.city.data
+      venue.state = form.state.data
+      venue.address = form.address.data
+      venue.phone = form.phone.data
+      venue.image_link = form.image_link.data
+      venue.website = form.website.data
+      venue.genres = genres_by_name(form.genres.data)
+      venue.facebook_link = form.facebook_link.data
+      venue.seeking_talent = seeking_talent
+      venue.seeking_description = seeking_description
+      # a genres-only edit doesn't UPDATE the row, so force the version bump
+      flag_modified(venue, 'name')
+      db.session.add(venue)
+      directory.refresh(areas=[(old_city, old_state), (venue.city, venue.state)])
+      db.session.commit()
+      # a new genre can add the venue's area to /venues?genre= pages that
+      # weren't tagged with it
+      cache.invalidate('venue:{}'.format(venue_id), 'venues')
+      autocomplete.entity_saved('venues', venue, (old_city, old_state))
+      flash('Venue ' + venue.name + ' was successfully changed.')
+    except SQLAlchemyError:
+      db.session.rollback()
+      current_app.logger.exception('could not save venue %s', venue_id)
+      flash('An error occurred. Changes could not be saved.')
+  else:
+    current_app.logger.info('venue form rejected', extra={'form_errors': form.errors})
+    flash('An error occurred. Please check the fields and try again', category='error')
+    return render_template('forms/edit_venue.html', form=form, venue=Venue.query.get_or_404(venue_id))
+
+  return redirect(url_for('.show_venue', venue_id=venue_id))
+
+@bp.route('/venues/<venue_id>', methods=['POST'])
+def delete_venue(venue_id):
+  try:
+    # the cascade removes this venue's shows, so their artists need recounting
+    artist_ids = [artist_id for artist_id, in db.session.query(Show.artist_id).filter(
+      Show.venue_id == venue_id).union(db.session.query(ShowArchive.artist_id).filter(
+      ShowArchive.venue_id == venue_id))]
+    areas = db.session.query(Venue.city, Venue.state).filter(Venue.id == venue_id).all()
+    venue = Venue.query.filter_by(id=venue_id).delete()
+    refresh_show_counts(datetime.now(), artist_ids=artist_ids)
+    directory.refresh(areas=areas)
+    db.session.commit()
+    cache.invalidate('venue:{}'.format(venue_id), *['area:{}/{}'.format(*area) for area in areas] +
+      ['artist:{}'.format(i) for i in artist_ids])
+    for city, state in areas:
+      autocomplete.entity_deleted('venues', venue_id, city, state)
+  except SQLAlchemyError:
+    current_app.logger.exception('could not delete venue %s', venue_id)
+    db.session.rollback()
+    flash('An error occurred. Venue could not be deleted.')
+    return redirect(url_for('.venues'))
+  flash('The venue and shows have been excluded.')
+  return redirect(url_for('index'))